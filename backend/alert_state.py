@@ -0,0 +1,68 @@
+# alert_state.py
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+import os
+from dotenv import load_dotenv
+
+from db import alert_states_collection
+
+load_dotenv()
+
+# An alert that is still firing is emailed again at most once per cooldown
+ALERT_COOLDOWN = timedelta(hours=float(os.getenv("ALERT_COOLDOWN_HOURS", 7 * 24)))
+
+def alert_period(now=None):
+    return (now or datetime.utcnow()).strftime('%Y-%m')
+
+def claim_alerts(email, alerts, now=None):
+    """
+    Record the user's currently firing alerts and return the ones that
+    should be emailed: categories that just went over budget this period,
+    and ones still over budget whose last email is older than ALERT_COOLDOWN.
+
+    The period's states are read once, so alerts that were already sent
+    cost no writes. The rest are claimed with a conditional upsert on the
+    unique (email, category, period) key, so concurrent uploads cannot both
+    send one. Categories no longer over budget go back to "ok" and alert
+    again on their next transition.
+    """
+    now = now or datetime.utcnow()
+    period = alert_period(now)
+    to_send = []
+    known = {
+        state['category']: state
+        for state in alert_states_collection.find({'email': email, 'period': period}, {'category': 1, 'state': 1, 'last_sent_at': 1})
+    }
+    for alert in alerts:
+        state = known.get(alert['category'])
+        if state and state.get('state') == 'over' and state.get('last_sent_at') and state['last_sent_at'] >= now - ALERT_COOLDOWN:
+            continue
+        try:
+            alert_states_collection.update_one(
+                {
+                    'email': email,
+                    'category': alert['category'],
+                    'period': period,
+                    '$or': [{'state': {'$ne': 'over'}}, {'last_sent_at': {'$lt': now - ALERT_COOLDOWN}}]
+                },
+                {'$set': {
+                    'state': 'over',
+                    'last_sent_at': now,
+                    'current_percentage': alert['current_percentage'],
+                    'budget_percentage': alert['budget_percentage']
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Already over budget and notified within the cooldown
+            continue
+        to_send.append(alert)
+
+    firing = {alert['category'] for alert in alerts}
+    resolved = [category for category, state in known.items() if state.get('state') == 'over' and category not in firing]
+    if resolved:
+        alert_states_collection.update_many(
+            {'email': email, 'period': period, 'category': {'$in': resolved}},
+            {'$set': {'state': 'ok'}}
+        )
+    return to_send
@@ -1,11 +1,16 @@
 import os
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from flask_mail import Mail, Message
 from routes.user import user_bp
 from routes.receipt import receipt_bp
+from db import ensure_indexes, missing_indexes, mismatched_indexes
+from rollups import rebuild_rollups
+from conversions import convert_missing
+from mailer import mailer, SUPPORT_EMAIL
 from dotenv import load_dotenv
 import logging
+import click
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -16,18 +21,6 @@ load_dotenv()
 
 app = Flask(__name__)           
 
-# Flask-Mail configuration from environment variables
-app.config['MAIL_SERVER'] = os.getenv('SMTP_HOST', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.getenv('SMTP_PORT', 587))
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True').lower() == 'true'
-app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', 'False').lower() == 'true'
-app.config['MAIL_USERNAME'] = os.getenv('EMAIL_USER')
-app.config['MAIL_PASSWORD'] = os.getenv('EMAIL_PASS')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('FROM_EMAIL')
-
-# Initialize Flask-Mail
-mail = Mail(app)
-
 # CORS configuration
 CORS(
     app,
@@ -51,6 +44,55 @@ CORS(
 app.register_blueprint(user_bp, url_prefix="/api/users")
 app.register_blueprint(receipt_bp, url_prefix="/api/receipt")
 
+# Make sure MongoDB indexes exist; also available as `flask ensure-indexes`
+def bootstrap_indexes():
+    try:
+        created, errors = ensure_indexes()
+        for collection_name, name in created:
+            logger.info("Created index %s on %s", name, collection_name)
+        for collection_name, name, error in errors:
+            logger.error("Could not create index %s on %s: %s", name, collection_name, error)
+        return created, errors
+    except Exception as e:
+        logger.error("Index bootstrap failed: %s", str(e))
+        return [], [(None, None, str(e))]
+
+# Runs in the background so an unreachable database does not hold up worker start
+if os.getenv('ENSURE_INDEXES', 'True').lower() == 'true':
+    threading.Thread(target=bootstrap_indexes, name="index-bootstrap", daemon=True).start()
+
+@app.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Create any missing MongoDB indexes."""
+    created, errors = bootstrap_indexes()
+    print(f"Created {len(created)} index(es), {len(errors)} error(s)")
+
+@app.cli.command('check-indexes')
+def check_indexes_command():
+    """Report MongoDB indexes that are missing or have the wrong options."""
+    missing = missing_indexes()
+    mismatched = mismatched_indexes()
+    for collection_name, name in missing:
+        print(f"Missing index {name} on {collection_name}")
+    for collection_name, name, reason in mismatched:
+        print(f"Error: index {name} on {collection_name} does not match: {reason}")
+    if not missing and not mismatched:
+        print("All indexes present")
+
+@app.cli.command('rebuild-rollups')
+@click.option('--email', default=None, help='Only rebuild this user\'s rollups.')
+def rebuild_rollups_command(email):
+    """Recompute the expense rollups from raw receipts."""
+    users = rebuild_rollups(email)
+    print(f"Rebuilt rollups for {users} user(s)")
+
+@app.cli.command('convert-receipts')
+@click.option('--email', default=None, help='Only convert this user\'s receipts.')
+def convert_receipts_command(email):
+    """Store default-currency amounts on receipts that do not have them yet."""
+    converted = convert_missing(email)
+    print(f"Converted {converted} receipt(s)")
+
 # Contact form endpoint
 @app.route('/api/contact', methods=['POST'])
 def handle_contact_form():
@@ -64,21 +106,21 @@ def handle_contact_form():
             logger.error("Missing fields in contact form: name=%s, email=%s", name, email)
             return jsonify({'success': False, 'message': 'All fields are required.'}), 400
 
-        # Email to user 
-        msg_user = Message(
-            subject="Thank You for Contacting Us!",
-            recipients=[email],
-            body=f"Hello {name},\n\nThank you for reaching out to us. We'll get back to you soon.\n\nBest,\nSupport Team"
+        # Email to user (both emails go out from the background mail queue)
+        user_queued = mailer.send(
+            email,
+            "Thank You for Contacting Us!",
+            f"Hello {name},\n\nThank you for reaching out to us. We'll get back to you soon.\n\nBest,\nSupport Team"
         )
-        mail.send(msg_user)
 
         # Email to support
-        msg_support = Message(
-            subject=f"New Contact Form Submission from {name}",
-            recipients=[os.getenv('EMAIL_USER')],
-            body=f"Name: {name}\nEmail: {email}\n\nMessage:\n{message}"
+        support_queued = mailer.send(
+            SUPPORT_EMAIL,
+            f"New Contact Form Submission from {name}",
+            f"Name: {name}\nEmail: {email}\n\nMessage:\n{message}"
         )
-        mail.send(msg_support)
+        if not (user_queued and support_queued):
+            return jsonify({'success': False, 'message': 'Failed to send message.'}), 503
 
         logger.info("Contact form submitted successfully: %s", email)
         return jsonify({'success': True, 'message': 'Message sent successfully!'}), 200
@@ -0,0 +1,104 @@
+# auth.py
+from functools import wraps
+from flask import request, jsonify, g
+from bson import ObjectId
+from bson.errors import InvalidId
+import logging
+import time
+import jwt
+import os
+from dotenv import load_dotenv
+
+from db import users_collection
+from ttl_cache import TTLCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Decoded tokens and user records are cached for at most AUTH_CACHE_TTL seconds
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 1024))
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 60))
+
+# The slice of a user document authenticated routes get in g.user
+AUTH_USER_FIELDS = {'email': 1, 'username': 1, 'name': 1, 'default_currency': 1, 'notifications': 1}
+
+token_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+user_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+class AuthError(Exception):
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def decode_token(token):
+    """Verify a JWT and return its payload, reusing earlier verifications."""
+    payload = token_cache.get(token)
+    if payload is not None:
+        # Cached entries never outlive the token, but check exp anyway
+        if payload.get('exp') and payload['exp'] <= time.time():
+            token_cache.pop(token)
+            raise AuthError('Token has expired')
+        return payload
+
+    jwt_secret = os.getenv('JWT_SECRET_KEY')
+    if not jwt_secret:
+        logger.error("JWT_SECRET_KEY not set")
+        raise AuthError('Server configuration error: JWT_SECRET_KEY missing', 500)
+    try:
+        payload = jwt.decode(token, jwt_secret, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        logger.warning("Token expired")
+        raise AuthError('Token has expired')
+    except jwt.InvalidTokenError:
+        logger.warning("Invalid token")
+        raise AuthError('Invalid token')
+    token_cache.put(token, payload, payload['exp'] - time.time() if payload.get('exp') else None)
+    return payload
+
+def load_user(user_id):
+    """Projected user record (AUTH_USER_FIELDS) for an id, or None."""
+    key = str(user_id)
+    user = user_cache.get(key)
+    if user is None:
+        user = users_collection.find_one({'_id': ObjectId(user_id)}, AUTH_USER_FIELDS)
+        if user is not None:
+            user_cache.put(key, user)
+    return user
+
+def invalidate_user(user_id):
+    """Drop a cached user record after the user document changes."""
+    user_cache.pop(str(user_id))
+
+def authenticate():
+    """Resolve the request's bearer token to (user_id, user); raises AuthError."""
+    header = request.headers.get('Authorization')
+    if not header or not header.startswith('Bearer '):
+        logger.warning("Token missing or invalid")
+        raise AuthError('Token missing or invalid')
+    payload = decode_token(header.split(' ')[1])
+    try:
+        user_id = ObjectId(payload.get('user_id'))
+    except (InvalidId, TypeError):
+        logger.warning("Invalid token")
+        raise AuthError('Invalid token')
+    user = load_user(user_id)
+    if not user:
+        logger.warning("User not found: %s", user_id)
+        raise AuthError('User not found', 404)
+    return user_id, user
+
+def require_auth(view):
+    """
+    Require a valid bearer token. The route runs with g.user_id set to the
+    user's ObjectId and g.user to their AUTH_USER_FIELDS record.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            g.user_id, g.user = authenticate()
+        except AuthError as e:
+            return jsonify({'message': e.message}), e.status
+        return view(*args, **kwargs)
+    return wrapper
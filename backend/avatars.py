@@ -0,0 +1,52 @@
+# avatars.py
+from datetime import datetime
+from bson import Binary
+import hashlib
+import base64
+import re
+import os
+from dotenv import load_dotenv
+
+from db import avatars_collection
+
+load_dotenv()
+
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", 2 * 1024 * 1024))
+
+# Raster formats only: avatars are served from the API origin, where an
+# SVG's scripts would run
+AVATAR_CONTENT_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp'}
+
+DATA_URL_PATTERN = re.compile(r'^data:(image/[\w.+-]+);base64,(.*)$', re.S)
+
+def parse_data_url(data_url):
+    """Split a data:image/...;base64 URL into (content_type, bytes); raises ValueError."""
+    m = DATA_URL_PATTERN.match(data_url)
+    if not m:
+        raise ValueError('Invalid avatar image format')
+    if m.group(1).lower() not in AVATAR_CONTENT_TYPES:
+        raise ValueError('Avatar must be a PNG, JPEG, GIF or WebP image')
+    try:
+        image = base64.b64decode(m.group(2), validate=True)
+    except Exception:
+        raise ValueError('Invalid avatar image format')
+    if len(image) > AVATAR_MAX_BYTES:
+        raise ValueError(f'Avatar image is larger than {AVATAR_MAX_BYTES // 1024} KB')
+    return m.group(1).lower(), image
+
+def store_avatar(user_id, content_type, image):
+    """Store an avatar image for a user; returns its ETag."""
+    etag = hashlib.sha256(image).hexdigest()[:32]
+    avatars_collection.replace_one(
+        {'_id': user_id},
+        {'_id': user_id, 'content_type': content_type, 'data': Binary(image),
+         'etag': etag, 'updated_at': datetime.utcnow()},
+        upsert=True
+    )
+    return etag
+
+def load_avatar(user_id, with_data=True):
+    return avatars_collection.find_one({'_id': user_id}, None if with_data else {'data': 0})
+
+def delete_avatar(user_id):
+    avatars_collection.delete_one({'_id': user_id})
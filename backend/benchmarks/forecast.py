@@ -0,0 +1,98 @@
+# forecast.py
+"""
+Time /report/forecast's per-category loop against the vectorized models
+in forecasting.py on synthetic rollup data, and check that the "sma"
+model matches the loop's results.
+
+    python benchmarks/forecast.py [categories=200] [years=10] [runs=20]
+
+Needs no database: the monthly totals and category months are generated
+in the shape RollupView returns them.
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forecasting import forecast, FORECAST_MODELS
+
+def synthetic_rollups(categories, years):
+    months = [f"{2000 + m // 12}-{m % 12 + 1:02d}" for m in range(years * 12)]
+    category_months = {}
+    for c in range(categories):
+        # Most categories only see spend in some months
+        density = random.uniform(0.1, 1.0)
+        category_months[f"category {c}"] = {
+            month: round(random.uniform(1, 500), 2) for month in months if random.random() < density
+        }
+    monthly_totals = [(month, sum(amounts.get(month, 0) for amounts in category_months.values())) for month in months]
+    return monthly_totals, category_months
+
+def legacy_forecast(monthly_data, categories):
+    months = [month for month, _ in monthly_data]
+    totals = [float(total) for _, total in monthly_data]
+
+    forecast_next_month = 0
+    if len(totals) >= 3:
+        forecast_next_month = float(np.mean(totals[-3:]))
+    elif len(totals) >= 1:
+        forecast_next_month = float(totals[-1])
+
+    all_months = sorted(set(months)) if months else []
+    category_forecasts = []
+    for cat, month_totals in categories.items():
+        cat_totals = [month_totals.get(m, 0) for m in all_months] if all_months else []
+        if not any(t > 0 for t in cat_totals):
+            continue
+
+        cat_forecast = 0
+        if len(cat_totals) >= 3:
+            cat_forecast = float(np.mean(cat_totals[-3:]))
+        elif len(cat_totals) >= 1:
+            cat_forecast = float(cat_totals[-1])
+
+        hist_avg = float(np.mean([t for t in cat_totals if t > 0])) if any(t > 0 for t in cat_totals) else 0
+        likely_overspend = cat_forecast > hist_avg * 1.2 if hist_avg > 0 else False
+
+        category_forecasts.append({
+            "category": cat,
+            "forecast": round(cat_forecast, 2),
+            "likely_overspend": likely_overspend
+        })
+    return {
+        'forecast_next_month': forecast_next_month,
+        'category_forecasts': sorted(category_forecasts, key=lambda x: x["forecast"], reverse=True)
+    }
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+if __name__ == "__main__":
+    categories = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    monthly_totals, category_months = synthetic_rollups(categories, years)
+
+    expected = legacy_forecast(monthly_totals, category_months)
+    actual = forecast(monthly_totals, category_months, 'sma')
+    matches = abs(expected['forecast_next_month'] - actual['forecast_next_month']) < 0.01 and \
+        sorted(map(lambda f: sorted(f.items()), expected['category_forecasts'])) == \
+        sorted(map(lambda f: sorted(f.items()), actual['category_forecasts']))
+
+    legacy = timed(lambda: legacy_forecast(monthly_totals, category_months), runs)
+    print(f"{categories} categories x {years * 12} months, median of {runs} runs")
+    print(f"per-category loop (sma): {legacy * 1000:.2f} ms")
+    for model in FORECAST_MODELS:
+        elapsed = timed(lambda: forecast(monthly_totals, category_months, model), runs)
+        print(f"vectorized {model + ':':<14}{elapsed * 1000:.2f} ms ({legacy / elapsed:.1f}x)")
+    print(f"sma matches the loop: {matches}")
@@ -0,0 +1,71 @@
+# ocr_preprocess.py
+"""
+Compare the legacy and receipt preprocessing paths on a folder of receipts.
+
+    python benchmarks/ocr_preprocess.py path/to/receipts
+
+Every .jpg/.png/.pdf in the folder is OCR'd with both paths. When a file
+has a sibling <name>.json holding the expected merchant, date and total,
+the parsed fields are checked against it.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ocr
+from receipt_parser import parse_receipt
+
+CONTENT_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.pdf': 'application/pdf'}
+FIELDS = ['merchant', 'date', 'total']
+
+def field_matches(field, actual, expected):
+    if field == 'total':
+        try:
+            return abs(float(actual) - float(expected)) < 0.01
+        except (TypeError, ValueError):
+            return False
+    return str(actual).strip().lower() == str(expected).strip().lower()
+
+def run(folder):
+    stats = {mode: {'seconds': 0.0, 'checked': 0, 'correct': 0} for mode in ('legacy', 'receipt')}
+    for name in sorted(os.listdir(folder)):
+        base, ext = os.path.splitext(name)
+        content_type = CONTENT_TYPES.get(ext.lower())
+        if not content_type:
+            continue
+        with open(os.path.join(folder, name), 'rb') as f:
+            file_bytes = f.read()
+        expected = None
+        expected_path = os.path.join(folder, base + '.json')
+        if os.path.exists(expected_path):
+            with open(expected_path, encoding='utf-8') as f:
+                expected = json.load(f)
+
+        row = [name]
+        for mode, mode_stats in stats.items():
+            ocr.OCR_PREPROCESS = mode
+            started = time.perf_counter()
+            text, _ = ocr.extract_text(file_bytes, content_type, workers=1)
+            elapsed = time.perf_counter() - started
+            data = parse_receipt(text)
+            mode_stats['seconds'] += elapsed
+            row.append(f"{mode}={elapsed:.2f}s")
+            if expected:
+                for field in FIELDS:
+                    if field in expected:
+                        mode_stats['checked'] += 1
+                        mode_stats['correct'] += int(field_matches(field, data.get(field), expected[field]))
+        print("  ".join(row))
+
+    for mode, mode_stats in stats.items():
+        accuracy = mode_stats['correct'] / mode_stats['checked'] * 100 if mode_stats['checked'] else 0
+        print(f"{mode}: total {mode_stats['seconds']:.2f}s, fields correct {mode_stats['correct']}/{mode_stats['checked']} ({accuracy:.1f}%)")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    run(sys.argv[1])
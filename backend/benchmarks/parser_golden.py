@@ -0,0 +1,80 @@
+# parser_golden.py
+"""
+Check parse_receipt against the golden corpus in benchmarks/parser_corpus:
+each <name>.txt holds OCR text and <name>.json the exact parse it must
+produce. Prints every mismatching field, exits 1 on any mismatch, and
+reports how long the corpus takes to parse.
+
+    python benchmarks/parser_golden.py [runs=200]
+    python benchmarks/parser_golden.py --update
+
+--update rewrites the .json files from the current parser; only use it
+for an intended change in parsing, and review the diff.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from receipt_parser import parse_receipt
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_corpus')
+
+def load_corpus():
+    corpus = []
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        base, ext = os.path.splitext(name)
+        if ext != '.txt':
+            continue
+        with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+            corpus.append((base, f.read()))
+    return corpus
+
+def expected_path(base):
+    return os.path.join(CORPUS_DIR, f"{base}.json")
+
+def update(corpus):
+    for base, text in corpus:
+        with open(expected_path(base), 'w', encoding='utf-8') as f:
+            json.dump(parse_receipt(text), f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+    print(f"Wrote {len(corpus)} expected parses")
+
+def check(corpus):
+    failures = 0
+    for base, text in corpus:
+        try:
+            with open(expected_path(base), encoding='utf-8') as f:
+                expected = json.load(f)
+        except FileNotFoundError:
+            print(f"{base}: no {base}.json; run with --update to create it")
+            failures += 1
+            continue
+        actual = json.loads(json.dumps(parse_receipt(text)))
+        if actual == expected:
+            continue
+        failures += 1
+        for field in sorted(set(expected) | set(actual)):
+            if expected.get(field) != actual.get(field):
+                print(f"{base}: {field}\n  expected {expected.get(field)!r}\n  actual   {actual.get(field)!r}")
+    print(f"{len(corpus) - failures}/{len(corpus)} receipts match")
+    return failures
+
+def bench(corpus, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        for _, text in corpus:
+            parse_receipt(text)
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed / (runs * len(corpus)) * 1e6:.1f} us per receipt over {runs} runs")
+
+if __name__ == '__main__':
+    corpus = load_corpus()
+    if '--update' in sys.argv[1:]:
+        update(corpus)
+        sys.exit(0)
+    failures = check(corpus)
+    bench(corpus, int(sys.argv[1]) if len(sys.argv) > 1 else 200)
+    sys.exit(1 if failures else 0)
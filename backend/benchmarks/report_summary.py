@@ -0,0 +1,127 @@
+# report_summary.py
+"""
+Time the ways /report/summary has been computed on a seeded user in a
+scratch database: five separate aggregations, one $facet aggregation,
+and reading the user's rollup rows.
+
+    python benchmarks/report_summary.py [receipts=10000] [runs=10]
+
+Uses MONGO_URI and the "receipt_scanner_bench" database, which is created
+and seeded on first run.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import client
+from categorizer import CATEGORY_KEYWORDS
+from rollups import RollupView, rollup_docs, rollup_increments, ROLLUP_FIELDS
+
+BENCH_EMAIL = "bench@example.com"
+
+def seed(collection, count):
+    existing = collection.count_documents({"email": BENCH_EMAIL})
+    if existing >= count:
+        return
+    categories = list(CATEGORY_KEYWORDS)
+    now = datetime.utcnow()
+    docs = []
+    for i in range(existing, count):
+        items = [{
+            'description': f"item {j}",
+            'amount': round(random.uniform(1, 200), 2),
+            'currency': 'INR',
+            'category': random.choice(categories)
+        } for j in range(random.randint(1, 8))]
+        docs.append({
+            'email': BENCH_EMAIL,
+            'merchant': f"merchant {random.randint(1, 300)}",
+            'currency': random.choice(['INR', 'INR', 'USD']),
+            'total': round(sum(item['amount'] for item in items), 2),
+            'tax': 0.0,
+            'tax_percent': 0.0,
+            'items': items,
+            'created_at': now - timedelta(days=random.randint(0, 3 * 365))
+        })
+    collection.insert_many(docs)
+
+def legacy_summary(collection, email):
+    match = {"$match": {"email": email}}
+    return [
+        list(collection.aggregate([match, {"$unwind": {"path": "$items", "preserveNullAndEmptyArrays": True}},
+                                   {"$group": {"_id": {"$ifNull": ["$items.category", "uncategorized"]}, "total": {"$sum": {"$ifNull": ["$items.amount", 0]}}}},
+                                   {"$sort": {"total": -1}}])),
+        list(collection.aggregate([match, {"$group": {"_id": {"$ifNull": ["$merchant", "unknown"]}, "total": {"$sum": {"$ifNull": ["$total", 0]}}}},
+                                   {"$sort": {"total": -1}}])),
+        list(collection.aggregate([match, {"$group": {"_id": {"$ifNull": ["$payment_mode", "unknown"]}, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}])),
+        list(collection.aggregate([match, {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": {"$ifNull": ["$created_at", datetime.utcnow()]}}}, "total": {"$sum": {"$ifNull": ["$total", 0]}}}},
+                                   {"$sort": {"_id": 1}}])),
+        list(collection.aggregate([match, {"$group": {"_id": "$currency", "count": {"$sum": 1}}}, {"$sort": {"count": -1}}, {"$limit": 1}])),
+    ]
+
+def facet_summary(collection, email):
+    return next(collection.aggregate([
+        {"$match": {"email": email}},
+        {"$facet": {
+            "by_category": [
+                {"$unwind": {"path": "$items", "preserveNullAndEmptyArrays": True}},
+                {"$group": {"_id": {"$ifNull": ["$items.category", "uncategorized"]}, "total": {"$sum": {"$ifNull": ["$items.amount", 0]}}}},
+                {"$sort": {"total": -1}}
+            ],
+            "by_merchant": [
+                {"$group": {"_id": {"$ifNull": ["$merchant", "unknown"]}, "total": {"$sum": {"$ifNull": ["$total", 0]}}}},
+                {"$sort": {"total": -1}}
+            ],
+            "by_payment_mode": [
+                {"$group": {"_id": {"$ifNull": ["$payment_mode", "unknown"]}, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}
+            ],
+            "monthly_trend": [
+                {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": {"$ifNull": ["$created_at", datetime.utcnow()]}}}, "total": {"$sum": {"$ifNull": ["$total", 0]}}}},
+                {"$sort": {"_id": 1}}
+            ],
+            "currency": [
+                {"$group": {"_id": "$currency", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+                {"$limit": 1}
+            ]
+        }}
+    ]), {})
+
+def seed_rollups(collection, rollups, email):
+    rollups.delete_many({"email": email})
+    rollups.insert_many(rollup_docs(rollup_increments(collection.find({"email": email}, ROLLUP_FIELDS))))
+
+def rollup_summary(rollups, email):
+    view = RollupView(list(rollups.find({"email": email}, {"_id": 0})))
+    return view.by_category(), view.by_merchant(), view.by_payment_mode(), view.monthly_totals(), view.currency()
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+if __name__ == "__main__":
+    receipts = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    collection = client["receipt_scanner_bench"]["expenses"]
+    collection.create_index([("email", 1), ("created_at", -1)])
+    seed(collection, receipts)
+    rollups = client["receipt_scanner_bench"]["expense_rollups"]
+    rollups.create_index([("email", 1), ("kind", 1), ("month", 1), ("key", 1)], unique=True)
+    seed_rollups(collection, rollups, BENCH_EMAIL)
+
+    legacy = timed(lambda: legacy_summary(collection, BENCH_EMAIL), runs)
+    facet = timed(lambda: facet_summary(collection, BENCH_EMAIL), runs)
+    rollup = timed(lambda: rollup_summary(rollups, BENCH_EMAIL), runs)
+    print(f"{receipts} receipts, median of {runs} runs")
+    print(f"five pipelines: {legacy * 1000:.1f} ms")
+    print(f"single $facet:  {facet * 1000:.1f} ms ({legacy / facet:.1f}x)")
+    print(f"rollup rows:    {rollup * 1000:.1f} ms ({legacy / rollup:.1f}x)")
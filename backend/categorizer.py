@@ -0,0 +1,159 @@
+# categorizer.py
+
+# Categories in priority order: a description matching keywords from several
+# categories is filed under the first one listed
+CATEGORY_KEYWORDS = {
+    'food & drinks': [
+        'restaurant', 'grocery', 'meal', 'dinner', 'lunch', 'breakfast', 'cafe',
+        'coffee', 'cappuccino', 'latte', 'espresso', 'muffin', 'pastry', 'croissant',
+        'snack', 'burger', 'pizza', 'sandwich', 'cake', 'bakery', 'donut', 'cookie',
+        'juice', 'beverage', 'drink', 'milk', 'apples', 'fruits', 'vegetables',
+        'meat', 'chicken', 'fish', 'beef', 'pork', 'rice', 'pasta', 'noodles',
+        'biryani', 'thali', 'paratha', 'samosa', 'pakora', 'tea'
+    ],
+    'travel & transport': [
+        'taxi', 'cab', 'uber', 'ola', 'hotel', 'motel', 'resort', 'hostel', 'airbnb',
+        'flight', 'airlines', 'indigo', 'emirates', 'spicejet', 'train', 'railway',
+        'bus', 'metro', 'tram', 'ferry', 'toll', 'parking', 'fuel', 'diesel', 'petrol',
+        'gasoline', 'car rental', 'bike rental', 'driver'
+    ],
+    'office & supplies': [
+        'paper', 'pen', 'printer', 'stationery', 'office', 'supplies', 'notebook',
+        'stapler', 'folder', 'file', 'highlighter', 'marker', 'ink', 'toner',
+        'eraser', 'board', 'whiteboard', 'chair', 'desk', 'furniture'
+    ],
+    'utilities & bills': [
+        'electricity', 'power', 'water', 'gas', 'internet', 'wifi', 'broadband',
+        'phone', 'mobile', 'cell', 'bill', 'recharge', 'cable', 'dth', 'telecom',
+        'airtel', 'jio', 'vodafone', 'bsnl'
+    ],
+    'electronics & gadgets': [
+        'headphones', 'earphones', 'airpods', 'speakers', 'laptop', 'computer', 'pc',
+        'desktop', 'monitor', 'keyboard', 'mouse', 'charger', 'adapter', 'mobile',
+        'tablet', 'smartphone', 'tv', 'television', 'camera', 'dslr', 'microwave',
+        'fridge', 'washing machine', 'ac', 'fan'
+    ],
+    'healthcare & pharmacy': [
+        'doctor', 'hospital', 'clinic', 'pharmacy', 'chemist', 'medicine', 'tablet',
+        'capsule', 'syrup', 'injection', 'surgery', 'xray', 'mri', 'scan',
+        'health', 'wellness', 'dental', 'dentist', 'optical', 'eyewear', 'spectacles',
+        'contact lens', 'mask', 'sanitizer', 'thermometer'
+    ],
+    'entertainment & media': [
+        'movie', 'cinema', 'theater', 'netflix', 'prime video', 'spotify', 'youtube',
+        'music', 'concert', 'game', 'gaming', 'playstation', 'xbox', 'nintendo',
+        'book', 'novel', 'magazine', 'newspaper', 'event', 'show', 'ticket'
+    ],
+    'shopping & fashion': [
+        'clothes', 'dress', 'shirt', 'tshirt', 'jeans', 'pants', 'trousers', 'jacket',
+        'sweater', 'hoodie', 'kurta', 'saree', 'lehenga', 'salwar', 'shoes', 'sandals',
+        'sneakers', 'boots', 'flipflops', 'bag', 'purse', 'handbag', 'wallet',
+        'watch', 'belt', 'cap', 'hat', 'sunglasses', 'jewelry', 'ring', 'necklace',
+        'bracelet', 'earrings', 'cosmetics', 'makeup', 'lipstick', 'perfume', 'beauty'
+    ],
+    'home & groceries': [
+        'detergent', 'soap', 'shampoo', 'toothpaste', 'toothbrush', 'cleaner',
+        'dishwash', 'floor cleaner', 'phenyl', 'mop', 'broom', 'utensil',
+        'spices', 'oil', 'salt', 'sugar', 'flour', 'atta', 'dal', 'beans', 'cereal'
+    ],
+    'education & learning': [
+        'school', 'college', 'university', 'fees', 'exam', 'coaching', 'tuition',
+        'course', 'online course', 'udemy', 'coursera', 'byjus', 'textbook',
+        'notebook', 'stationery', 'library', 'training', 'class','mouse'
+    ],
+    'personal care': [
+        'salon', 'spa', 'parlor', 'barber', 'haircut', 'massage', 'facial',
+        'cream', 'lotion', 'skincare', 'nail', 'manicure', 'pedicure'
+    ],
+    'sports & fitness': [
+        'gym', 'fitness', 'workout', 'yoga', 'zumba', 'trainer', 'cricket', 'bat',
+        'ball', 'football', 'basketball', 'tennis', 'racket', 'shuttle', 'jersey',
+        'cycle', 'bicycle', 'helmet', 'sports shoes', 'treadmill', 'dumbbell'
+    ],
+    'financial services': [
+        'bank', 'atm', 'loan', 'emi', 'insurance', 'mutual fund', 'policy',
+        'lic', 'sip', 'investment', 'credit card', 'debit card', 'upi',
+        'paytm', 'gpay', 'phonepe', 'stripe', 'paypal'
+    ],
+    'housing & rent': [
+        'rent', 'lease', 'apartment', 'flat', 'villa', 'pg', 'guesthouse',
+        'maintenance', 'society', 'property', 'brokerage'
+    ],
+    'others': [
+        'gift', 'donation', 'charity', 'subscription', 'membership', 'miscellaneous','gym'
+    ]
+}
+
+UNCATEGORIZED = 'uncategorized'
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over every category keyword.
+
+    Built once; each lookup is a single pass over the lowercased text that
+    reports the highest-priority category any keyword hit belongs to,
+    matching the old "first category with a substring hit" rule.
+    """
+
+    def __init__(self, category_keywords):
+        self.categories = list(category_keywords)
+        goto = [{}]
+        best = [None]
+
+        for priority, keywords in enumerate(category_keywords.values()):
+            for keyword in keywords:
+                state = 0
+                for ch in keyword:
+                    if ch not in goto[state]:
+                        goto.append({})
+                        best.append(None)
+                        goto[state][ch] = len(goto) - 1
+                    state = goto[state][ch]
+                if best[state] is None or priority < best[state]:
+                    best[state] = priority
+
+        # Breadth-first pass computing failure links, folding each state's
+        # failure output into it and turning goto into a full transition table
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            fallback = best[fail[state]]
+            if fallback is not None and (best[state] is None or fallback < best[state]):
+                best[state] = fallback
+            for ch, child in goto[state].items():
+                queue.append(child)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f][ch] if ch in goto[f] and goto[f][ch] != child else 0
+            for ch, target in goto[fail[state]].items():
+                goto[state].setdefault(ch, target)
+
+        self.goto = goto
+        self.best = best
+
+    def match(self, text):
+        goto, best = self.goto, self.best
+        found = None
+        state = 0
+        for ch in text:
+            state = goto[state].get(ch, 0)
+            priority = best[state]
+            if priority is not None and (found is None or priority < found):
+                found = priority
+                if found == 0:
+                    break
+        return self.categories[found] if found is not None else UNCATEGORIZED
+
+category_automaton = KeywordAutomaton(CATEGORY_KEYWORDS)
+
+def categorize_item(desc):
+    return category_automaton.match(desc.lower())
+
+def categorize_items(descs):
+    """Categorize many descriptions at once, e.g. for re-categorization jobs."""
+    match = category_automaton.match
+    return [match(desc.lower()) for desc in descs]
@@ -0,0 +1,118 @@
+# conversions.py
+from pymongo import UpdateOne
+import threading
+import traceback
+import os
+from dotenv import load_dotenv
+
+from db import expenses_collection, users_collection
+from exchange_rates import exchange_rates
+from receipt_parser import normalize_currency
+from rollups import rebuild_rollups
+from response_cache import response_cache
+
+load_dotenv()
+
+# Receipts stored while no rate was available are retried in the background:
+# attempt n runs CONVERSION_RETRY_DELAY * n seconds after the previous one
+CONVERSION_RETRY_DELAY = int(os.getenv("CONVERSION_RETRY_DELAY", 60))
+CONVERSION_RETRY_ATTEMPTS = int(os.getenv("CONVERSION_RETRY_ATTEMPTS", 5))
+
+CONVERTED_FIELDS = ('converted_total', 'converted_tax', 'converted_currency', 'exchange_rate')
+
+def receipt_currency(receipt):
+    """Currency code of a stored receipt; older receipts may hold a symbol."""
+    currency = receipt.get('currency')
+    return normalize_currency(currency, currency)
+
+def user_currency(email):
+    user = users_collection.find_one({'email': email}, {'default_currency': 1})
+    return (user or {}).get('default_currency', 'USD')
+
+def convert_receipt(receipt, to_currency):
+    """
+    Add the receipt's total and tax in `to_currency` at today's rate.
+    Returns False, leaving the receipt unconverted, when no rate is available.
+    """
+    try:
+        rate = exchange_rates.get_rate(receipt_currency(receipt), to_currency)
+    except Exception as e:
+        print(f"Could not convert receipt from {receipt_currency(receipt)} to {to_currency}: {str(e)}")
+        return False
+    receipt['converted_currency'] = to_currency
+    receipt['exchange_rate'] = rate
+    receipt['converted_total'] = (receipt.get('total') or 0) * rate
+    receipt['converted_tax'] = (receipt.get('tax') or 0) * rate
+    return True
+
+def convert_missing(email=None):
+    """
+    Convert receipts stored without converted amounts (uploaded before
+    conversion at ingest, or while no rate was available) and rebuild the
+    affected users' rollups. Returns the number of receipts converted.
+    """
+    query = {'converted_currency': {'$exists': False}}
+    if email:
+        query['email'] = email
+    currencies = {}
+    converted = set()
+    ops = []
+    for receipt in expenses_collection.find(query, {'email': 1, 'currency': 1, 'total': 1, 'tax': 1}):
+        if receipt['email'] not in currencies:
+            currencies[receipt['email']] = user_currency(receipt['email'])
+        if convert_receipt(receipt, currencies[receipt['email']]):
+            ops.append(UpdateOne({'_id': receipt['_id']}, {'$set': {field: receipt[field] for field in CONVERTED_FIELDS}}))
+            converted.add(receipt['email'])
+    for start in range(0, len(ops), 1000):
+        expenses_collection.bulk_write(ops[start:start + 1000], ordered=False)
+    for user_email in converted:
+        rebuild_rollups(user_email)
+        response_cache.bump(user_email)
+    return len(ops)
+
+_retrying = set()
+_retrying_lock = threading.Lock()
+
+def retry_conversion(email, attempt=1):
+    """
+    Convert a user's unconverted receipts in the background once rates are
+    available again; convert_missing() then rebuilds their rollups so budget
+    and tax reports pick the amounts up. One retry chain per user and process.
+    """
+    with _retrying_lock:
+        if attempt == 1:
+            if email in _retrying:
+                return
+            _retrying.add(email)
+    timer = threading.Timer(CONVERSION_RETRY_DELAY * attempt, _retry_conversion, args=(email, attempt))
+    timer.daemon = True
+    timer.start()
+
+def _retry_conversion(email, attempt):
+    try:
+        convert_missing(email)
+        pending = expenses_collection.find_one({'email': email, 'converted_currency': {'$exists': False}}, {'_id': 1})
+    except Exception as e:
+        print(f"Error retrying currency conversion for {email}: {str(e)}")
+        traceback.print_exc()
+        pending = True
+    if pending and attempt < CONVERSION_RETRY_ATTEMPTS:
+        retry_conversion(email, attempt + 1)
+        return
+    if pending:
+        print(f"Receipts for {email} still unconverted after {attempt} retries; run `flask convert-receipts --email {email}`")
+    with _retrying_lock:
+        _retrying.discard(email)
+
+def reconvert_receipts(email, to_currency):
+    """Re-express a user's converted amounts in a new default currency."""
+    for from_currency in expenses_collection.distinct('converted_currency', {'email': email}):
+        if not from_currency or from_currency == to_currency:
+            continue
+        rate = exchange_rates.get_rate(from_currency, to_currency)
+        expenses_collection.update_many(
+            {'email': email, 'converted_currency': from_currency},
+            {'$mul': {'converted_total': rate, 'converted_tax': rate, 'exchange_rate': rate},
+             '$set': {'converted_currency': to_currency}}
+        )
+    rebuild_rollups(email)
@@ -1,4 +1,4 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
 import os
 from dotenv import load_dotenv
 
@@ -8,4 +8,82 @@ MONGO_URI = os.getenv("MONGO_URI")
 client = MongoClient(MONGO_URI)
 db = client["receipt_scanner"]
 expenses_collection = db["expenses"]
-users_collection = db["users"]
\ No newline at end of file
+users_collection = db["users"]
+rollups_collection = db["expense_rollups"]
+avatars_collection = db["avatars"]
+alert_states_collection = db["alert_states"]
+
+# Indexes the app relies on, per collection: (keys, options)
+INDEXES = {
+    "expenses": [
+        # Also serves /list's keyset pagination, which sorts on (created_at, _id)
+        ([("email", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "email_created_at_id"}),
+        ([("email", ASCENDING), ("content_hash", ASCENDING)], {"name": "email_content_hash"}),
+    ],
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+    "expense_rollups": [
+        ([("email", ASCENDING), ("kind", ASCENDING), ("month", ASCENDING), ("key", ASCENDING)],
+         {"name": "email_kind_month_key", "unique": True}),
+    ],
+    "alert_states": [
+        ([("email", ASCENDING), ("period", ASCENDING), ("category", ASCENDING)],
+         {"name": "email_period_category", "unique": True}),
+    ],
+}
+
+def _key_spec(keys):
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in keys)
+
+def _index_status():
+    """
+    Yield (collection, index name, existing) for every index in INDEXES, where
+    `existing` lists the database indexes with the same keys as (name, unique).
+    """
+    for collection_name, specs in INDEXES.items():
+        existing = db[collection_name].index_information()
+        for keys, options in specs:
+            matches = [(name, bool(info.get("unique"))) for name, info in existing.items()
+                       if _key_spec(info["key"]) == _key_spec(keys)]
+            yield collection_name, options, matches
+
+def missing_indexes():
+    """Return (collection, index name) for every index in INDEXES with no index on its keys."""
+    return [(collection_name, options["name"]) for collection_name, options, matches in _index_status() if not matches]
+
+def mismatched_indexes():
+    """
+    Return (collection, index name, reason) for every index in INDEXES whose
+    keys are indexed but without the same `unique` option. These cannot be
+    fixed by creating the index; the existing one has to be dropped first.
+    """
+    mismatched = []
+    for collection_name, options, matches in _index_status():
+        unique = bool(options.get("unique"))
+        if matches and all(existing_unique != unique for _, existing_unique in matches):
+            names = ", ".join(name for name, _ in matches)
+            mismatched.append((collection_name, options["name"],
+                               f"existing index {names} has unique={not unique}, expected unique={unique}"))
+    return mismatched
+
+def ensure_indexes():
+    """
+    Create any index in INDEXES that is missing. Indexes that already exist
+    (under any name) with the same `unique` option are left alone, so this is
+    safe to run on every start; ones with a different `unique` option are
+    reported as errors. Returns the names created and the errors hit, per
+    collection.
+    """
+    created, errors = [], mismatched_indexes()
+    missing = set(missing_indexes())
+    for collection_name, specs in INDEXES.items():
+        for keys, options in specs:
+            if (collection_name, options["name"]) not in missing:
+                continue
+            try:
+                db[collection_name].create_index(keys, **options)
+                created.append((collection_name, options["name"]))
+            except Exception as e:
+                errors.append((collection_name, options["name"], str(e)))
+    return created, errors
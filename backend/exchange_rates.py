@@ -0,0 +1,173 @@
+# exchange_rates.py
+import json
+import logging
+import re
+import threading
+import time
+import requests
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EXCHANGE_RATE_URL = os.getenv("EXCHANGE_RATE_URL", "https://open.er-api.com/v6/latest/{base}")
+# Every pair is derived from this base's table when both currencies are in it
+EXCHANGE_RATE_BASE = os.getenv("EXCHANGE_RATE_BASE", "USD")
+# Seconds a fetched table is fresh; stale tables are served while a refresh runs,
+# up to EXCHANGE_RATE_MAX_STALE seconds old
+EXCHANGE_RATE_TTL = int(os.getenv("EXCHANGE_RATE_TTL", 3600))
+EXCHANGE_RATE_MAX_STALE = int(os.getenv("EXCHANGE_RATE_MAX_STALE", 24 * 3600))
+EXCHANGE_RATE_TIMEOUT = float(os.getenv("EXCHANGE_RATE_TIMEOUT", 5))
+# Seconds a failed fetch for a base is remembered, so callers fail fast instead of refetching
+EXCHANGE_RATE_FAILURE_TTL = int(os.getenv("EXCHANGE_RATE_FAILURE_TTL", 60))
+# JSON file of {"base": ..., "rates": {...}} served instead of the live API, for offline use
+EXCHANGE_RATE_FIXTURE = os.getenv("EXCHANGE_RATE_FIXTURE")
+
+# ISO 4217 codes; anything else is rejected before it reaches a provider
+CURRENCY_CODE_PATTERN = re.compile(r'^[A-Z]{3}$')
+
+class HttpRateProvider:
+    """Fetches rate tables from open.er-api.com over a shared session."""
+
+    def __init__(self, url=EXCHANGE_RATE_URL, timeout=EXCHANGE_RATE_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def fetch(self, base):
+        resp = self.session.get(self.url.format(base=base), timeout=self.timeout)
+        resp.raise_for_status()
+        data = resp.json()
+        if 'rates' not in data:
+            raise ValueError(f"No rates returned for {base}")
+        return {code: float(rate) for code, rate in data['rates'].items()}
+
+class FixtureRateProvider:
+    """Serves rates from a local table, rebased to whatever base is asked for."""
+
+    def __init__(self, base, rates):
+        self.base = base
+        self.rates = {code: float(rate) for code, rate in rates.items()}
+        self.rates[base] = 1.0
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['base'], data['rates'])
+
+    def fetch(self, base):
+        if base not in self.rates:
+            raise ValueError(f"No rates for {base} in fixture")
+        return {code: rate / self.rates[base] for code, rate in self.rates.items()}
+
+class ExchangeRateCache:
+    """
+    Rate tables per base currency with a TTL.
+
+    A fresh table is served from memory. A stale one is still served while
+    a single background thread refetches it, and a missing or too-stale one
+    is fetched inline, one fetch per base however many callers are waiting;
+    if that fetch fails the caller gets the error, never the too-stale table.
+    A failed fetch is remembered for failure_ttl seconds and re-raised
+    without calling the provider.
+    """
+
+    def __init__(self, provider, ttl=EXCHANGE_RATE_TTL, max_stale=EXCHANGE_RATE_MAX_STALE, base=EXCHANGE_RATE_BASE,
+                 failure_ttl=EXCHANGE_RATE_FAILURE_TTL):
+        self.provider = provider
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.base = base
+        self.failure_ttl = failure_ttl
+        self._tables = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._refreshing = set()
+
+    def _fetch(self, base):
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(base, threading.Lock())
+        with fetch_lock:
+            # Another caller may have fetched it while we waited
+            entry = self._tables.get(base)
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            failure = self._failures.get(base)
+            if failure and time.monotonic() - failure[1] < self.failure_ttl:
+                raise ValueError(f"Exchange rates for {base} unavailable: {failure[0]}")
+            try:
+                rates = self.provider.fetch(base)
+            except Exception as e:
+                with self._lock:
+                    self._failures[base] = (str(e), time.monotonic())
+                raise
+            with self._lock:
+                self._tables[base] = (rates, time.monotonic())
+                self._failures.pop(base, None)
+            logger.debug('Fetched %d exchange rates for %s', len(rates), base)
+            return rates
+
+    def _refresh(self, base):
+        try:
+            self._fetch(base)
+        except Exception as e:
+            logger.error('Background exchange rate refresh for %s failed: %s', base, str(e))
+        finally:
+            with self._lock:
+                self._refreshing.discard(base)
+
+    def table(self, base):
+        """Return the rate table for `base`."""
+        with self._lock:
+            entry = self._tables.get(base)
+        if entry:
+            rates, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                return rates
+            if age < self.ttl + self.max_stale:
+                with self._lock:
+                    start = base not in self._refreshing
+                    self._refreshing.add(base)
+                if start:
+                    threading.Thread(target=self._refresh, args=(base,), name=f"rates-{base}", daemon=True).start()
+                return rates
+        try:
+            return self._fetch(base)
+        except Exception:
+            # Past max_stale a table is not served at all; callers such as
+            # convert_receipt store the receipt unconverted and retry later
+            if entry:
+                logger.error('Exchange rate fetch for %s failed and its table is older than the stale limit', base)
+            raise
+
+    def get_rate(self, from_currency, to_currency):
+        for code in (from_currency, to_currency):
+            if not isinstance(code, str) or not CURRENCY_CODE_PATTERN.match(code):
+                raise ValueError(f"Invalid currency code: {code!r}")
+        if from_currency == to_currency:
+            return 1.0
+        rates = self.table(self.base)
+        if from_currency in rates and to_currency in rates:
+            return rates[to_currency] / rates[from_currency]
+        # Not in the base table: fall back to the source currency's own table
+        rates = self.table(from_currency)
+        if to_currency not in rates:
+            raise ValueError('Invalid currency in rates')
+        return rates[to_currency]
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self._failures.clear()
+
+def default_provider():
+    if EXCHANGE_RATE_FIXTURE:
+        return FixtureRateProvider.from_file(EXCHANGE_RATE_FIXTURE)
+    return HttpRateProvider()
+
+exchange_rates = ExchangeRateCache(default_provider())
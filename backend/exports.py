@@ -0,0 +1,89 @@
+# exports.py
+import csv
+import io
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Receipts fetched per cursor batch and written per response chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+EXPORT_BATCH_MAX = int(os.getenv("EXPORT_BATCH_MAX", 5000))
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# Oldest first, for bookkeeping
+EXPORT_SORT = [("created_at", 1), ("_id", 1)]
+
+RECEIPT_COLUMNS = ['receipt_id', 'created_at', 'date', 'merchant', 'payment_mode', 'currency', 'total', 'subtotal',
+                   'tax', 'tax_percent', 'converted_currency', 'converted_total', 'converted_tax']
+ITEM_COLUMNS = ['item_index', 'item_description', 'item_category', 'item_amount', 'item_currency']
+EXPORT_COLUMNS = RECEIPT_COLUMNS + ITEM_COLUMNS
+
+EXPORT_FIELDS = {'created_at': 1, 'date': 1, 'merchant': 1, 'payment_mode': 1, 'currency': 1, 'total': 1,
+                 'subtotal': 1, 'tax': 1, 'tax_percent': 1, 'converted_currency': 1, 'converted_total': 1,
+                 'converted_tax': 1, 'items': 1}
+
+def export_rows(receipt):
+    """One row per line item, repeating the receipt's fields; a receipt without items gives one row."""
+    base = {
+        'receipt_id': str(receipt['_id']),
+        'created_at': receipt['created_at'].isoformat() if receipt.get('created_at') else None,
+    }
+    for column in RECEIPT_COLUMNS[2:]:
+        base[column] = receipt.get(column)
+    items = receipt.get('items') or [None]
+    for index, item in enumerate(items):
+        row = dict(base)
+        if item is not None:
+            row.update({
+                'item_index': index,
+                'item_description': item.get('description'),
+                'item_category': item.get('category'),
+                'item_amount': item.get('amount'),
+                'item_currency': item.get('currency')
+            })
+        else:
+            row.update(dict.fromkeys(ITEM_COLUMNS))
+        yield row
+
+# Leading characters that make Excel and similar tools run a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def csv_safe(row):
+    """
+    Prefix string cells that start like a formula with a quote, so OCR text
+    such as a merchant "=HYPERLINK(...)" opens as text. Numbers are left as is.
+    """
+    return {column: "'" + value if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+            for column, value in row.items()}
+
+def _batches(receipts, batch_size):
+    batch = []
+    for receipt in receipts:
+        batch.extend(export_rows(receipt))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def csv_chunks(receipts, batch_size=EXPORT_BATCH_SIZE):
+    """CSV text of `receipts` (any iterable, e.g. a cursor), one chunk per batch after the header."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue()
+    for batch in _batches(receipts, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(csv_safe(row) for row in batch)
+        yield buffer.getvalue()
+
+def ndjson_chunks(receipts, batch_size=EXPORT_BATCH_SIZE):
+    """One JSON object per line item, one chunk per batch."""
+    for batch in _batches(receipts, batch_size):
+        yield "".join(json.dumps(row, default=str) + "\n" for row in batch)
+
+EXPORT_WRITERS = {'csv': csv_chunks, 'ndjson': ndjson_chunks}
@@ -0,0 +1,108 @@
+# forecasting.py
+from itertools import chain, repeat
+import numpy as np
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Months averaged by the moving-average model
+FORECAST_WINDOW = int(os.getenv("FORECAST_WINDOW", 3))
+# Smoothing factor of the exponential model; higher weighs recent months more
+FORECAST_ALPHA = float(os.getenv("FORECAST_ALPHA", 0.5))
+# Most recent months the linear trend is fitted to
+FORECAST_TREND_MONTHS = int(os.getenv("FORECAST_TREND_MONTHS", 12))
+# A category is likely to overspend when its forecast exceeds its average month by this factor
+OVERSPEND_FACTOR = 1.2
+
+def moving_average(matrix, window=None):
+    """Mean of each row's last `window` months; rows shorter than that use their last month."""
+    window = window or FORECAST_WINDOW
+    if matrix.shape[1] >= window:
+        return matrix[:, -window:].mean(axis=1)
+    return matrix[:, -1].copy()
+
+def exponential_smoothing(matrix, alpha=None):
+    """
+    Final level of s[0] = x[0], s[t] = alpha * x[t] + (1 - alpha) * s[t-1]
+    for every row, computed as one matrix-vector product with the closed
+    form weights instead of a loop over months.
+    """
+    alpha = FORECAST_ALPHA if alpha is None else alpha
+    months = matrix.shape[1]
+    weights = alpha * (1 - alpha) ** np.arange(months - 1, -1, -1, dtype=float)
+    weights[0] = (1 - alpha) ** (months - 1)
+    return matrix @ weights
+
+def linear_trend(matrix, months=None):
+    """Least-squares line through each row's recent months, evaluated one month ahead."""
+    recent = matrix[:, -(months or FORECAST_TREND_MONTHS):]
+    count = recent.shape[1]
+    if count < 2:
+        return recent[:, -1].copy()
+    t = np.arange(count, dtype=float)
+    t_centered = t - t.mean()
+    means = recent.mean(axis=1)
+    slopes = (recent - means[:, None]) @ t_centered / (t_centered @ t_centered)
+    # Spend cannot go negative however steep the decline
+    return np.maximum(means + slopes * (count - t.mean()), 0)
+
+FORECAST_MODELS = {
+    'sma': moving_average,
+    'ema': exponential_smoothing,
+    'trend': linear_trend,
+}
+
+def category_matrix(category_months, months):
+    """Pivot {category: {month: amount}} into (categories, len(categories) x len(months) array)."""
+    categories = list(category_months)
+    column = {month: i for i, month in enumerate(months)}
+    # Build flat cell indexes straight from the dicts and sum them with one
+    # bincount; filling numpy cells one at a time, or via Python lists,
+    # costs more than the models themselves
+    month_amounts = [category_months[category] for category in categories]
+    rows = np.repeat(np.arange(len(categories)), [len(amounts) for amounts in month_amounts])
+    columns = np.fromiter(chain.from_iterable(map(column.get, amounts, repeat(-1)) for amounts in month_amounts),
+                          dtype=np.intp, count=len(rows))
+    amounts = np.fromiter(chain.from_iterable(amounts.values() for amounts in month_amounts),
+                          dtype=float, count=len(rows))
+    # Months outside `months` (column -1) are dropped
+    known = columns >= 0
+    matrix = np.bincount(rows[known] * len(months) + columns[known], weights=amounts[known],
+                         minlength=len(categories) * len(months))
+    return categories, matrix.reshape(len(categories), len(months))
+
+def forecast(monthly_totals, category_months, model='sma'):
+    """
+    Next month's forecast for total spend and for every category.
+
+    monthly_totals is [(month, total)] in month order and category_months
+    {category: {month: amount}}, as returned by RollupView. The totals and
+    all categories are stacked into one matrix so each model runs once.
+    """
+    months = [month for month, _ in monthly_totals]
+    if not months:
+        return {'forecast_next_month': 0, 'category_forecasts': []}
+    categories, matrix = category_matrix(category_months, months)
+    matrix = np.vstack([np.array([total for _, total in monthly_totals], dtype=float), matrix])
+    predicted = FORECAST_MODELS[model](matrix)
+
+    spending = matrix[1:] > 0
+    active = spending.any(axis=1)
+    # Average over the months a category had spend in
+    hist_avg = np.divide(matrix[1:].sum(axis=1, where=spending), spending.sum(axis=1),
+                         out=np.zeros(len(categories)), where=active)
+    likely_overspend = (hist_avg > 0) & (predicted[1:] > hist_avg * OVERSPEND_FACTOR)
+
+    category_forecasts = [
+        {
+            "category": categories[i],
+            "forecast": round(float(predicted[i + 1]), 2),
+            "likely_overspend": bool(likely_overspend[i])
+        }
+        for i in np.flatnonzero(active)
+    ]
+    return {
+        'forecast_next_month': float(predicted[0]),
+        'category_forecasts': sorted(category_forecasts, key=lambda x: x["forecast"], reverse=True)
+    }
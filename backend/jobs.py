@@ -0,0 +1,199 @@
+# jobs.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+import traceback
+import uuid
+import os
+import time
+from dotenv import load_dotenv
+
+import ocr
+
+load_dotenv()
+
+# OCR job queue configuration; the pool is sized by OCR_HOST_PROCESSES in ocr.py
+OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", 32))
+OCR_JOB_TTL = int(os.getenv("OCR_JOB_TTL", 3600))
+# Batch upload jobs waiting or running at once, and how many run concurrently
+OCR_MAX_BATCHES = int(os.getenv("OCR_MAX_BATCHES", 4))
+OCR_BATCH_WORKERS = int(os.getenv("OCR_BATCH_WORKERS", 2))
+
+class QueueFull(Exception):
+    pass
+
+class OcrJobQueue:
+    """
+    Bounded queue of OCR jobs run on the shared OCR process pool.
+
+    Tesseract runs in the worker processes; the finish callback (parse,
+    insert, alerts) runs on a small thread pool in this process so the
+    pool's result-handling thread is never blocked on Mongo or SMTP.
+    Batch jobs run on their own threads and OCR through map(); they are
+    bounded by max_batches rather than by queue slots, so a batch waiting
+    for room never holds the room it waits for. Job state lives in memory,
+    per web worker process.
+    """
+
+    def __init__(self, max_queue=OCR_MAX_QUEUE, ttl=OCR_JOB_TTL, max_batches=OCR_MAX_BATCHES,
+                 batch_workers=OCR_BATCH_WORKERS):
+        self.max_queue = max_queue
+        self.max_batches = max_batches
+        self.ttl = ttl
+        self._jobs = {}
+        # Reentrant so submit() can check pending() while holding it
+        self._lock = threading.RLock()
+        # Batch OCR tasks in flight, counted against max_queue like jobs
+        self._reserved = 0
+        self._finisher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ocr-finish")
+        self._batches = ThreadPoolExecutor(max_workers=batch_workers, thread_name_prefix="ocr-batch")
+
+    def _active(self, kind):
+        return sum(1 for job in self._jobs.values() if job['_kind'] == kind and job['status'] in ('queued', 'running'))
+
+    def pending(self):
+        with self._lock:
+            return self._reserved + self._active('ocr')
+
+    def submit(self, file_bytes, content_type, on_done, owner=None):
+        """
+        Queue an upload for OCR. `on_done(text, pages)` is called with the OCR
+        text and per-page timings and its return value becomes the job result. Raises QueueFull when
+        max_queue jobs are already waiting or running. Jobs with an `owner` are
+        only visible to get() calls passing the same owner.
+        """
+        # Pages run serially inside a job: it already holds one of the pool's processes
+        job_id, future = self._start('ocr', owner, ocr.pool_submit, ocr.extract_text, file_bytes, content_type, 1)
+        future.add_done_callback(lambda f: self._finisher.submit(self._finish, job_id, f, on_done))
+        return job_id
+
+    def submit_batch(self, task, owner=None):
+        """
+        Run `task()` as a job on a batch thread; its return value becomes the
+        job result. The task does its OCR through map(wait=True). Raises
+        QueueFull when max_batches batch jobs are already waiting or running.
+        """
+        job_id, future = self._start('batch', owner, self._batches.submit, task)
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _start(self, kind, owner, submit, *args):
+        self._evict_expired()
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        with self._lock:
+            if kind == 'batch':
+                active = self._active('batch')
+                if active >= self.max_batches:
+                    raise QueueFull(f"Too many batch uploads in progress ({active} pending)")
+            else:
+                active = self.pending()
+                if active >= self.max_queue:
+                    raise QueueFull(f"OCR queue is full ({active} jobs pending)")
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'created_at': now,
+                'updated_at': now,
+                'result': None,
+                'error': None,
+                'ocr_pages': [],
+                '_future': None,
+                '_expires': None,
+                '_owner': owner,
+                '_kind': kind
+            }
+        try:
+            future = submit(*args)
+        except Exception:
+            # Otherwise the job would stay queued, and count against its limit, forever
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            raise
+        with self._lock:
+            self._jobs[job_id]['_future'] = future
+        return job_id, future
+
+    def map(self, items, wait=False):
+        """
+        OCR (file_bytes, content_type) pairs on the job pool for a caller that
+        waits on the returned futures. They count against max_queue until they
+        finish. When they do not all fit, raises QueueFull, or with `wait`
+        polls until they do.
+        """
+        if wait and len(items) > self.max_queue:
+            raise ValueError(f"Cannot OCR more than {self.max_queue} files at once")
+        while True:
+            with self._lock:
+                active = self.pending()
+                if active + len(items) <= self.max_queue:
+                    self._reserved += len(items)
+                    break
+            if not wait:
+                raise QueueFull(f"OCR queue is full ({active} jobs pending)")
+            time.sleep(0.5)
+        futures = []
+        try:
+            for file_bytes, content_type in items:
+                future = ocr.pool_submit(ocr.extract_text, file_bytes, content_type, 1)
+                future.add_done_callback(self._release)
+                futures.append(future)
+        except Exception:
+            with self._lock:
+                self._reserved -= len(items) - len(futures)
+            raise
+        return futures
+
+    def _release(self, future):
+        with self._lock:
+            self._reserved -= 1
+
+    def _finish(self, job_id, future, on_done=None):
+        try:
+            if on_done is None:
+                self._update(job_id, status='done', result=future.result())
+                return
+            text, pages = future.result()
+            result = on_done(text, pages)
+            self._update(job_id, status='done', result=result, ocr_pages=pages)
+        except Exception as e:
+            print(f"Error in OCR job {job_id}: {str(e)}")
+            traceback.print_exc()
+            self._update(job_id, status='failed', error=str(e))
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job['updated_at'] = datetime.utcnow()
+            job['_expires'] = time.monotonic() + self.ttl
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job['_expires'] and job['_expires'] < now]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def get(self, job_id, owner=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['_owner'] != owner:
+                return None
+            status = job['status']
+            future = job['_future']
+            if status == 'queued' and future is not None and (future.running() or future.done()):
+                status = 'running'
+            return {
+                'job_id': job['job_id'],
+                'status': status,
+                'created_at': job['created_at'].isoformat(),
+                'updated_at': job['updated_at'].isoformat(),
+                'result': job['result'],
+                'error': job['error'],
+                'ocr_pages': job['ocr_pages']
+            }
+
+ocr_jobs = OcrJobQueue()
@@ -0,0 +1,142 @@
+# mailer.py
+from email.message import EmailMessage
+import threading
+import smtplib
+import logging
+import queue
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Accepts both the receipt blueprint's (SMTP_SERVER/SMTP_USERNAME/SMTP_PASSWORD)
+# and the contact form's (SMTP_HOST/EMAIL_USER/EMAIL_PASS) variable names
+SMTP_SERVER = os.getenv("SMTP_SERVER") or os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME") or os.getenv("EMAIL_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD") or os.getenv("EMAIL_PASS")
+MAIL_USE_TLS = os.getenv("MAIL_USE_TLS", "True").lower() == "true"
+MAIL_USE_SSL = os.getenv("MAIL_USE_SSL", "False").lower() == "true"
+MAIL_FROM = os.getenv("FROM_EMAIL") or SMTP_USERNAME
+SUPPORT_EMAIL = os.getenv("SUPPORT_EMAIL") or SMTP_USERNAME
+
+# "smtp" sends for real, "console" logs messages, "memory" keeps them in
+# mailer.backend.outbox (for tests and local development)
+MAIL_BACKEND = os.getenv("MAIL_BACKEND", "smtp").lower()
+# Seconds an unused SMTP connection is kept open
+MAIL_IDLE_TIMEOUT = int(os.getenv("MAIL_IDLE_TIMEOUT", 60))
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", 1000))
+
+def build_message(to_email, subject, body, sender=None):
+    msg = EmailMessage()
+    msg['From'] = sender or MAIL_FROM
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.set_content(body)
+    return msg
+
+class SmtpBackend:
+    """Sends over one authenticated SMTP connection, reopened when it drops."""
+
+    def __init__(self):
+        self._server = None
+
+    def _connect(self):
+        if MAIL_USE_SSL:
+            server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, timeout=30)
+        else:
+            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+            if MAIL_USE_TLS:
+                server.starttls()
+        if SMTP_USERNAME and SMTP_PASSWORD:
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        return server
+
+    def send(self, msg):
+        for attempt in range(2):
+            if self._server is None:
+                self._server = self._connect()
+            try:
+                self._server.send_message(msg)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):
+                # The server dropped an idle connection; retry once on a fresh one
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+class ConsoleBackend:
+    def send(self, msg):
+        logger.info("Email to %s: %s\n%s", msg['To'], msg['Subject'], msg.get_content())
+
+    def close(self):
+        pass
+
+class MemoryBackend:
+    def __init__(self):
+        self.outbox = []
+
+    def send(self, msg):
+        self.outbox.append(msg)
+
+    def close(self):
+        pass
+
+BACKENDS = {'smtp': SmtpBackend, 'console': ConsoleBackend, 'memory': MemoryBackend}
+
+class Mailer:
+    """
+    Outbound mail queue. send() only enqueues; a background thread per
+    process delivers messages in order over the backend's connection and
+    closes it after MAIL_IDLE_TIMEOUT seconds without mail.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._queue = queue.Queue(maxsize=MAIL_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        # Started lazily, and again in each forked worker
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="mailer", daemon=True)
+                self._thread.start()
+
+    def send(self, to_email, subject, body):
+        """Queue an email; returns False when the queue is full."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(build_message(to_email, subject, body))
+            return True
+        except queue.Full:
+            logger.error("Mail queue full, dropping email to %s: %s", to_email, subject)
+            return False
+
+    def _run(self):
+        while True:
+            try:
+                msg = self._queue.get(timeout=MAIL_IDLE_TIMEOUT)
+            except queue.Empty:
+                self.backend.close()
+                continue
+            try:
+                self.backend.send(msg)
+                logger.info("Email sent to %s", msg['To'])
+            except Exception as e:
+                logger.error("Error sending email to %s: %s", msg['To'], str(e))
+
+mailer = Mailer(BACKENDS.get(MAIL_BACKEND, SmtpBackend)())
@@ -0,0 +1,313 @@
+# ocr.py
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
+import pytesseract
+import cv2
+import numpy as np
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+import threading
+import time
+import io
+import os
+from dotenv import load_dotenv
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+load_dotenv()
+
+POPLER_PATH = r"C:\Users\panth\Downloads\Release-25.07.0-0\poppler-25.07.0\Library\bin"
+pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+SUPPORTED_CONTENT_TYPES = ['image/jpeg', 'image/png', 'application/pdf']
+
+# OCR engine: "auto" keeps Tesseract loaded in-process through tesserocr when it is
+# installed and falls back to one pytesseract subprocess per image otherwise
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto").lower()
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+
+# OCR processes for the whole host, split evenly between the web workers;
+# WEB_CONCURRENCY is the worker count gunicorn reads as well
+OCR_HOST_PROCESSES = int(os.getenv("OCR_HOST_PROCESSES", os.cpu_count() or 2))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+# Size of each web worker's one OCR process pool
+OCR_PROCESSES = max(1, OCR_HOST_PROCESSES // max(1, WEB_CONCURRENCY))
+# Number of pages of one document OCR'd in parallel
+OCR_PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", OCR_PROCESSES))
+# PDF rasterization settings; pages beyond the cap are ignored
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", 200))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", 50))
+
+# Image preprocessing: "receipt" crops, deskews and rescales before thresholding,
+# "legacy" thresholds the full-resolution image as uploaded
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "receipt").lower()
+# Median glyph height, in pixels, that images are rescaled to before Tesseract
+OCR_TARGET_TEXT_HEIGHT = int(os.getenv("OCR_TARGET_TEXT_HEIGHT", 30))
+# Longest side of the downscaled copy used to find the receipt outline
+OCR_DETECT_SIZE = 1000
+# Upscaling for small text never grows an image past this many pixels on its longest side
+OCR_MAX_SIDE = 4000
+
+# Identifies everything that changes OCR output; cached results from other versions are ignored
+OCR_CONFIG_VERSION = f"2-{OCR_ENGINE}-{OCR_LANG}-dpi{OCR_PDF_DPI}-pages{OCR_MAX_PAGES}-{OCR_PREPROCESS}-h{OCR_TARGET_TEXT_HEIGHT}"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    This web worker's OCR process pool, shared by async jobs, batch uploads
+    and the page fan-out of synchronous uploads. Created on first use so
+    gunicorn workers never inherit one from the master.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and getattr(_pool, '_broken', False):
+            _discard_pool()
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=OCR_PROCESSES, initializer=get_engine)
+        return _pool
+
+def _discard_pool():
+    # Caller holds _pool_lock
+    global _pool
+    print("OCR process pool is broken, starting a new one")
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+def replace_pool(broken):
+    """Swap out `broken` for a fresh pool, unless another thread already has."""
+    with _pool_lock:
+        if _pool is broken:
+            _discard_pool()
+    return get_pool()
+
+def pool_submit(fn, *args):
+    """Submit to the OCR pool; a pool broken by a dead child is replaced and the submit retried once."""
+    pool = get_pool()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        return replace_pool(pool).submit(fn, *args)
+
+def pool_map(fn, *iterables):
+    """Like pool_submit(), for a map whose results are all collected before returning."""
+    pool = get_pool()
+    try:
+        return list(pool.map(fn, *iterables))
+    except BrokenProcessPool:
+        return list(replace_pool(pool).map(fn, *iterables))
+
+def iter_pages(file_bytes, content_type, window=1):
+    """
+    Yield batches of at most `window` (page_number, image) pairs.
+
+    PDFs are rasterized one window at a time at OCR_PDF_DPI, so only the
+    current window of pages is ever held in memory, whatever the length
+    of the document.
+    """
+    if content_type in ['image/jpeg', 'image/png']:
+        yield [(1, Image.open(io.BytesIO(file_bytes)))]
+        return
+    if content_type != 'application/pdf':
+        raise ValueError(f"Unsupported file type: {content_type}")
+
+    page_count = pdfinfo_from_bytes(file_bytes, poppler_path=POPLER_PATH)['Pages']
+    if page_count > OCR_MAX_PAGES:
+        print(f"PDF has {page_count} pages, only the first {OCR_MAX_PAGES} will be processed")
+        page_count = OCR_MAX_PAGES
+
+    for first in range(1, page_count + 1, window):
+        last = min(first + window - 1, page_count)
+        images = convert_from_bytes(
+            file_bytes,
+            dpi=OCR_PDF_DPI,
+            first_page=first,
+            last_page=last,
+            poppler_path=POPLER_PATH
+        )
+        yield list(zip(range(first, last + 1), images))
+
+def preprocess_legacy(img):
+    open_cv_image = np.array(img)
+    gray = cv2.cvtColor(open_cv_image, cv2.COLOR_BGR2GRAY)
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+def find_receipt(gray):
+    """
+    Locate the receipt as the largest bright quadrilateral-ish contour.
+    Returns its minimum-area rectangle in full-resolution coordinates,
+    or None when nothing covers a meaningful part of the frame.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, OCR_DETECT_SIZE / max(height, width))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+
+    blurred = cv2.GaussianBlur(small, (5, 5), 0)
+    edges = cv2.Canny(blurred, 50, 150)
+    edges = cv2.dilate(edges, np.ones((5, 5), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    contour = max(contours, key=cv2.contourArea)
+    rect = cv2.minAreaRect(contour)
+    (cx, cy), (w, h), angle = rect
+    frame_area = small.shape[0] * small.shape[1]
+    if w * h < 0.05 * frame_area or w * h > 0.95 * frame_area:
+        return None
+
+    # Only a paper-on-background photo has a darker surround; a scanned page or a
+    # tightly framed photo would otherwise be cropped to its largest text block
+    mask = np.zeros(small.shape[:2], np.uint8)
+    cv2.fillPoly(mask, [cv2.boxPoints(rect).astype(np.int32)], 255)
+    inside = cv2.mean(small, mask=mask)[0]
+    outside = cv2.mean(small, mask=255 - mask)[0]
+    if inside - outside < 30:
+        return None
+    return (cx / scale, cy / scale), (w / scale, h / scale), angle
+
+def crop_and_deskew(gray, rect):
+    (cx, cy), (w, h), angle = rect
+    # minAreaRect's angle range differs between OpenCV versions; fold it into (-45, 45]
+    while angle > 45:
+        angle -= 90
+        w, h = h, w
+    while angle <= -45:
+        angle += 90
+        w, h = h, w
+    if abs(angle) > 0.5:
+        matrix = cv2.getRotationMatrix2D((cx, cy), angle, 1.0)
+        gray = cv2.warpAffine(gray, matrix, (gray.shape[1], gray.shape[0]),
+                              flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    x0, y0 = max(int(cx - w / 2), 0), max(int(cy - h / 2), 0)
+    x1, y1 = min(int(cx + w / 2), gray.shape[1]), min(int(cy + h / 2), gray.shape[0])
+    if x1 - x0 < 32 or y1 - y0 < 32:
+        return gray
+    return gray[y0:y1, x0:x1]
+
+def estimate_text_height(binary):
+    """Median height of glyph-sized connected components in a thresholded image."""
+    count, _, stats, _ = cv2.connectedComponentsWithStats(255 - binary, connectivity=8)
+    if count <= 1:
+        return None
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    glyphs = heights[(heights >= 4) & (heights <= binary.shape[0] * 0.1) & (widths <= heights * 4)]
+    if len(glyphs) < 10:
+        return None
+    return float(np.median(glyphs))
+
+def preprocess(img):
+    """
+    Crop to the receipt, deskew it and rescale so text sits at
+    OCR_TARGET_TEXT_HEIGHT before Otsu thresholding, so Tesseract's work
+    follows the size of the receipt rather than the camera resolution.
+    """
+    if OCR_PREPROCESS == "legacy":
+        return preprocess_legacy(img)
+
+    gray = np.array(img.convert('L'))
+    rect = find_receipt(gray)
+    if rect is not None:
+        gray = crop_and_deskew(gray, rect)
+
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    text_height = estimate_text_height(thresh)
+    if text_height:
+        scale = min(max(OCR_TARGET_TEXT_HEIGHT / text_height, 0.25), 2.0)
+        if scale > 1.0:
+            scale = max(1.0, min(scale, OCR_MAX_SIDE / max(gray.shape[:2])))
+        if abs(scale - 1.0) > 0.1:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+            thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    return thresh
+
+class PytesseractEngine:
+    """Runs the tesseract CLI once per image; always available."""
+    name = "pytesseract"
+
+    def image_to_string(self, image):
+        return pytesseract.image_to_string(image, lang=OCR_LANG)
+
+class TesserocrEngine:
+    """Keeps one Tesseract instance loaded for the life of the process."""
+    name = "tesserocr"
+
+    def __init__(self):
+        self._api = tesserocr.PyTessBaseAPI(lang=OCR_LANG)
+        self._lock = threading.Lock()
+
+    def image_to_string(self, image):
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        with self._lock:
+            self._api.SetImage(image)
+            return self._api.GetUTF8Text()
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    Return this process's OCR engine, creating it on first use. Worker
+    processes build their own instead of reusing one inherited on fork.
+    """
+    global _engine, _engine_pid
+    with _engine_lock:
+        if _engine is not None and _engine_pid == os.getpid():
+            return _engine
+        engine = None
+        if OCR_ENGINE in ("auto", "tesserocr") and tesserocr is not None:
+            try:
+                engine = TesserocrEngine()
+            except Exception as e:
+                print(f"Could not start tesserocr, falling back to pytesseract: {str(e)}")
+        elif OCR_ENGINE == "tesserocr":
+            print("OCR_ENGINE is tesserocr but tesserocr is not installed, using pytesseract")
+        if engine is None:
+            engine = PytesseractEngine()
+        _engine, _engine_pid = engine, os.getpid()
+        return _engine
+
+def ocr_image(img):
+    return get_engine().image_to_string(preprocess(img))
+
+def ocr_page(page, img):
+    started = time.perf_counter()
+    text = ocr_image(img)
+    return {
+        'page': page,
+        'text': text,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+def extract_text(file_bytes, content_type, workers=None):
+    """
+    Run the full OCR pipeline (rasterize, preprocess, Tesseract) on an upload.
+
+    PDF pages are rasterized in windows of `workers` pages and each window
+    is fanned out over the OCR pool; page order is preserved in the
+    returned text. Returns the text and a list of per-page timings. Kept
+    free of Flask/Mongo imports so it can run inside worker processes.
+    """
+    workers = max(1, OCR_PAGE_WORKERS if workers is None else workers)
+    results = []
+    for batch in iter_pages(file_bytes, content_type, window=workers):
+        pages = [page for page, _ in batch]
+        images = [img for _, img in batch]
+        if len(batch) > 1:
+            results.extend(pool_map(ocr_page, pages, images))
+        else:
+            results.extend(ocr_page(page, img) for page, img in batch)
+        for img in images:
+            img.close()
+
+    text = ''.join(r['text'] + '\n\n' for r in results)
+    timings = [{'page': r['page'], 'seconds': r['seconds']} for r in results]
+    return text, timings
@@ -0,0 +1,147 @@
+# ocr_cache.py
+from collections import OrderedDict
+import hashlib
+import threading
+import copy
+import json
+import time
+import os
+from dotenv import load_dotenv
+
+from ocr import OCR_CONFIG_VERSION
+
+load_dotenv()
+
+# Number of OCR results kept in memory; set OCR_CACHE_DIR to also keep them on disk
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", 512))
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR")
+# Bytes the on-disk tier may hold; the least recently used files are pruned past it
+OCR_CACHE_DIR_BYTES = int(os.getenv("OCR_CACHE_DIR_BYTES", 256 * 1024 * 1024))
+# Disk writes between prunes of the on-disk tier
+OCR_CACHE_PRUNE_EVERY = int(os.getenv("OCR_CACHE_PRUNE_EVERY", 100))
+
+def content_hash(file_bytes):
+    return hashlib.sha256(file_bytes).hexdigest()
+
+class OcrCache:
+    """
+    LRU cache of OCR results keyed by upload content hash and OCR config
+    version, with an optional on-disk tier shared by all workers.
+
+    Entries hold the OCR text and the per-page timings of the original run.
+    Parsed results are not cached: they depend on receipt_parser and the
+    categorizer, which change between deploys, and parsing is cheap next
+    to OCR. Disk hits refresh a file's mtime, so
+    prune() can evict by mtime as an LRU.
+    """
+
+    def __init__(self, max_entries=OCR_CACHE_SIZE, directory=OCR_CACHE_DIR, max_bytes=OCR_CACHE_DIR_BYTES,
+                 prune_every=OCR_CACHE_PRUNE_EVERY):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._prune_safely()
+
+    def _key(self, digest):
+        return f"{digest}-{OCR_CONFIG_VERSION}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, digest):
+        key = self._key(digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return copy.deepcopy(entry)
+
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading OCR cache entry {key}: {str(e)}")
+            return None
+        self._remember(key, entry)
+        return copy.deepcopy(entry)
+
+    def put(self, digest, text, ocr_pages=None):
+        key = self._key(digest)
+        entry = {'text': text, 'ocr_pages': copy.deepcopy(ocr_pages or [])}
+        self._remember(key, entry)
+
+        if not self.directory:
+            return
+        try:
+            tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"Error writing OCR cache entry {key}: {str(e)}")
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self._prune_safely()
+
+    def prune(self):
+        """
+        Delete on-disk entries written under another OCR_CONFIG_VERSION and
+        temp files left by crashed writes, then the least recently used
+        entries until the tier fits in max_bytes. Returns the files removed.
+        """
+        suffix = f"-{OCR_CONFIG_VERSION}.json"
+        current = []
+        doomed = []
+        with os.scandir(self.directory) as files:
+            for file in files:
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                if file.name.endswith(suffix):
+                    current.append((stat.st_mtime, stat.st_size, file.path))
+                elif file.name.endswith('.json') or (file.name.endswith('.tmp') and stat.st_mtime < time.time() - 3600):
+                    doomed.append(file.path)
+        total = sum(size for _, size, _ in current)
+        for _, size, path in sorted(current):
+            if total <= self.max_bytes:
+                break
+            doomed.append(path)
+            total -= size
+        removed = 0
+        for path in doomed:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass  # Another worker pruned it first
+        return removed
+
+    def _prune_safely(self):
+        try:
+            self.prune()
+        except Exception as e:
+            print(f"Error pruning OCR cache directory {self.directory}: {str(e)}")
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+ocr_cache = OcrCache()
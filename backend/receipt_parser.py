@@ -0,0 +1,214 @@
+# receipt_parser.py
+import re
+
+from categorizer import categorize_item
+
+CURRENCY_SYMBOL = r'(?:(₹|\$|€|£)|(?:\b(INR|USD|EUR|GBP)\b))?'
+NUMBER = r'([\d]+(?:[.,]\d{1,2})?)'
+
+SKIP_KEYWORDS = ["address", "receipt", "invoice", "bill", "tax id", "store name",
+                 "merchant", "cashier", "order", "payment", "mode", "date"]
+
+def normalize_currency(symbol, code):
+    mapping = {"₹": "INR", "$": "USD", "€": "EUR", "£": "GBP"}
+    if symbol and symbol in mapping:
+        return mapping[symbol]  # Return currency code for API
+    if code:
+        return code.upper()
+    return "INR"  # Default to INR code
+
+class ReceiptParser:
+    """
+    Turns OCR text into a receipt dict (merchant, date, totals, tax, items).
+
+    All patterns are compiled once. parse() walks the lines a single time;
+    each line is lowercased and checked against the skip keywords once and
+    then fed to the merchant, date, totals and item scanners in turn.
+    """
+
+    date_patterns = [
+        re.compile(r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b'),
+        re.compile(r'\b(\d{4}[/-]\d{1,2}[/-]\d{1,2})\b'),
+        re.compile(r'([A-Za-z]{3,9}\s+\d{1,2},?\s+\d{4})')
+    ]
+    amount_pattern = re.compile(CURRENCY_SYMBOL + r'\s*' + NUMBER, re.I)
+    tax_pattern = re.compile(r'Tax\s*\(?\s*(\d{1,2}(?:\.\d{1,2})?)?\s*%?\s*(?:GST)?\)?\s*[:\-]?\s*' + CURRENCY_SYMBOL + r'\s*' + NUMBER, re.I)
+
+    item_pattern_table = re.compile(r'^(.*?)\s+(\d+)\s+' + NUMBER + r'\s+' + NUMBER + r'$')
+    item_pattern_block_item = re.compile(r'item[:\-]\s*(.+)', re.I)
+    item_pattern_block_price = re.compile(r'price[:\-]\s*' + CURRENCY_SYMBOL + r'\s*' + NUMBER, re.I)
+    item_pattern_block_qty = re.compile(r'quantity[:\-]\s*(.+)', re.I)
+    item_pattern_compact = re.compile(r'^(.*?)\s*[x×]\s*(\d+)\s*(?:[^\d]*?)' + CURRENCY_SYMBOL + r'\s*' + NUMBER + r'$', re.I)
+    item_pattern_direct_total = re.compile(r'^(.*?)\s*[x×]\s*(\d+)\s*' + CURRENCY_SYMBOL + r'\s*' + NUMBER + r'$', re.I)
+    qty_pattern = re.compile(r'(\d+)')
+    price_chars_pattern = re.compile(r'[\d₹$€£.,]+')
+    skip_pattern = re.compile('|'.join(re.escape(k) for k in SKIP_KEYWORDS))
+
+    def __init__(self, categorize):
+        self.categorize = categorize
+
+    def parse(self, text):
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+        data = {
+            'merchant': '',
+            'date': '',
+            'currency': '₹',
+            'subtotal': 0.0,
+            'tax': 0.0,
+            'tax_percent': 0.0,
+            'total': 0.0,
+            'items': []
+        }
+
+        merchant_done = False
+        date_done = False
+        next_item_line = 0
+        # Table rows are priced in the receipt's final currency, known only after the last line
+        table_items = []
+
+        for i, line in enumerate(lines):
+            l = line.lower()
+            skipped = self.skip_pattern.search(l) is not None
+
+            if i < 10 and not merchant_done:
+                if l.startswith("store name"):
+                    data['merchant'] = line.split(":", 1)[-1].strip()
+                    merchant_done = True
+                elif not data['merchant'] and not skipped:
+                    data['merchant'] = line
+
+            if not date_done:
+                if "date" in l:
+                    data['date'] = line.split(":")[-1].strip()
+                    date_done = True
+                else:
+                    for dp in self.date_patterns:
+                        m = dp.search(line)
+                        if m:
+                            data['date'] = m.group(1)
+                            break
+
+            self._scan_totals(line, l, data)
+
+            if i >= next_item_line:
+                if skipped or "total" in l or "tax" in l:
+                    next_item_line = i + 1
+                else:
+                    next_item_line = self._scan_item(lines, i, line, data, table_items)
+
+        for item, desc, qty, unit_price in table_items:
+            currency = data['currency']
+            item['description'] = f"{desc} (x{qty} @ {currency}{unit_price:.2f})"
+            item['currency'] = currency
+
+        return data
+
+    def _scan_totals(self, line, l, data):
+        m_tax = self.tax_pattern.search(line)
+        if m_tax:
+            try:
+                percent, symbol, code, amount = m_tax.groups()
+                data['tax_percent'] = float(percent) if percent else 0.0
+                data['tax'] = float(amount.replace(',', '')) if amount else 0.0
+                data['currency'] = normalize_currency(symbol, code)
+            except:
+                pass
+
+        m = self.amount_pattern.search(line)
+        if not m:
+            return
+        symbol, code, number = m.groups()
+        currency = normalize_currency(symbol, code)
+        if currency:
+            data['currency'] = currency
+        try:
+            val = float(number.replace(',', ''))
+        except:
+            return
+        if "subtotal" in l:
+            data['subtotal'] = val
+        elif "total" in l:
+            data['total'] = val
+
+    def _add_item(self, data, desc, amount, currency, description=None):
+        item = {
+            'description': description if description is not None else desc,
+            'amount': amount,
+            'currency': currency,
+            'category': self.categorize(desc)
+        }
+        data['items'].append(item)
+        return item
+
+    def _scan_item(self, lines, i, line, data, table_items):
+        """Match one item line; returns the index of the next line to scan for items."""
+        m = self.item_pattern_table.match(line)
+        if m:
+            desc, qty_str, unit_str, total_str = m.groups()
+            try:
+                qty = int(qty_str)
+                unit_price = float(unit_str.replace(',', ''))
+                total_price = float(total_str.replace(',', ''))
+                item = self._add_item(data, desc, total_price, None, '')
+                table_items.append((item, desc, qty, unit_price))
+            except:
+                pass
+            return i + 1
+
+        m = self.item_pattern_block_item.search(line)
+        if m:
+            desc = m.group(1).strip()
+            price, qty_str, currency = None, None, None
+            j = i + 1
+            while j < len(lines) and j <= i + 3:
+                pm = self.item_pattern_block_price.search(lines[j])
+                if pm:
+                    currency = normalize_currency(pm.group(1), pm.group(2)) or data['currency']
+                    try:
+                        price = float(pm.group(3).replace(',', ''))
+                    except:
+                        pass
+                qm = self.item_pattern_block_qty.search(lines[j])
+                if qm:
+                    qty_str = qm.group(1).strip()
+                j += 1
+            if price is not None:
+                qty = 1
+                if qty_str:
+                    m_qty = self.qty_pattern.search(qty_str)
+                    if m_qty:
+                        qty = int(m_qty.group(1))
+                self._add_item(data, desc, qty * price, currency, f"{desc} (x{qty} @ {currency}{price:.2f})")
+            return j
+
+        m = self.item_pattern_compact.match(line) or self.item_pattern_direct_total.match(line)
+        if m:
+            desc, qty_str, symbol, code, price_str = m.groups()
+            try:
+                qty = int(qty_str)
+                total_price = float(price_str.replace(',', '')) if price_str else 0.0
+                currency = normalize_currency(symbol, code) or data['currency']
+                unit_price = total_price / qty if qty > 0 else total_price
+                self._add_item(data, desc, total_price, currency, f"{desc} (x{qty} @ {currency}{unit_price:.2f})")
+            except:
+                pass
+            return i + 1
+
+        m = self.amount_pattern.search(line)
+        if m:
+            symbol, code, number = m.groups()
+            currency = normalize_currency(symbol, code) or data['currency']
+            try:
+                price = float(number.replace(',', ''))
+            except:
+                price = 0.0
+            desc = self.price_chars_pattern.sub('', line).strip(" -:→")
+            if len(desc.split()) > 0 and not desc.lower().startswith("date"):
+                self._add_item(data, desc, price, currency)
+        return i + 1
+
+receipt_parser = ReceiptParser(categorize_item)
+
+def parse_receipt(text):
+    return receipt_parser.parse(text)
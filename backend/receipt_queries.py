@@ -0,0 +1,93 @@
+# receipt_queries.py
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+import base64
+import json
+import re
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Page sizes for /list
+RECEIPT_PAGE_SIZE = int(os.getenv("RECEIPT_PAGE_SIZE", 20))
+RECEIPT_PAGE_MAX = int(os.getenv("RECEIPT_PAGE_MAX", 100))
+
+# Newest first; _id breaks ties between receipts stored in the same instant
+RECEIPT_SORT = [("created_at", -1), ("_id", -1)]
+
+# Fields of the "summary" view; "full" returns whole receipts with their items
+SUMMARY_FIELDS = {'merchant': 1, 'date': 1, 'total': 1, 'tax': 1, 'currency': 1, 'payment_mode': 1,
+                  'converted_total': 1, 'converted_currency': 1, 'created_at': 1}
+
+def parse_date(value, end=False):
+    """
+    ISO date or datetime from a query parameter, as naive UTC like the
+    stored created_at values; offsets are converted, not dropped. A bare
+    date given as an end bound covers that whole day. Raises ValueError.
+    """
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_amount(value, name):
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+def receipt_filters(email, args):
+    """
+    Mongo query for a user's receipts narrowed by request args:
+    start_date/end_date (ISO, end inclusive), merchant (case-insensitive
+    substring), category (exact item category) and min_amount/max_amount
+    (receipt total). Raises ValueError on a malformed value.
+    """
+    query = {'email': email}
+    created_at = {}
+    try:
+        if args.get('start_date'):
+            created_at['$gte'] = parse_date(args['start_date'])
+        if args.get('end_date'):
+            created_at['$lt'] = parse_date(args['end_date'], end=True)
+    except ValueError:
+        raise ValueError("start_date and end_date must be ISO dates, e.g. 2024-03-31")
+    if created_at:
+        query['created_at'] = created_at
+    if args.get('merchant'):
+        query['merchant'] = {'$regex': re.escape(args['merchant']), '$options': 'i'}
+    if args.get('category'):
+        query['items.category'] = args['category']
+    total = {}
+    if args.get('min_amount'):
+        total['$gte'] = parse_amount(args['min_amount'], 'min_amount')
+    if args.get('max_amount'):
+        total['$lte'] = parse_amount(args['max_amount'], 'max_amount')
+    if total:
+        query['total'] = total
+    return query
+
+def encode_cursor(receipt):
+    """Opaque cursor pointing just past a receipt in RECEIPT_SORT order."""
+    position = {'t': receipt['created_at'].isoformat(), 'id': str(receipt['_id'])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """(created_at, _id) from encode_cursor(); raises ValueError."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(position['t']), ObjectId(position['id'])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("Invalid cursor")
+
+def after_cursor(query, cursor):
+    """Restrict a query to receipts after the cursor, keyset style, so deep pages use the index like the first."""
+    created_at, receipt_id = decode_cursor(cursor)
+    return {'$and': [query, {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, '_id': {'$lt': receipt_id}}
+    ]}]}
@@ -0,0 +1,177 @@
+# reports.py
+from functools import cached_property
+from datetime import datetime
+
+from db import users_collection
+from rollups import load_rollups
+from forecasting import forecast
+
+# Periods /overview-data can report on; ytd is the default
+OVERVIEW_PERIODS = ('ytd', 'all', 'month')
+
+# User fields the report widgets read
+REPORT_USER_FIELDS = {'default_currency': 1, 'monthly_budget': 1, 'yearly_budget': 1}
+
+class ReportContext:
+    """
+    Everything the report widgets need for one user, loaded on first use.
+    Widgets built from the same context share the rollup read, the user
+    lookup and derived results such as the category totals.
+    """
+
+    def __init__(self, email, now=None):
+        self.email = email
+        self.now = now or datetime.utcnow()
+
+    @cached_property
+    def rollups(self):
+        return load_rollups(self.email)
+
+    @cached_property
+    def user(self):
+        return users_collection.find_one({'email': self.email}, REPORT_USER_FIELDS)
+
+    @cached_property
+    def currency(self):
+        """Most common receipt currency."""
+        return self.rollups.currency() or "₹"
+
+    @cached_property
+    def default_currency(self):
+        return (self.user or {}).get('default_currency', 'USD')
+
+    @cached_property
+    def by_category(self):
+        return self.rollups.by_category()
+
+    @cached_property
+    def monthly_totals(self):
+        return self.rollups.monthly_totals()
+
+    @property
+    def year_start(self):
+        return f"{self.now.year}-01"
+
+    @property
+    def this_month(self):
+        return self.now.strftime('%Y-%m')
+
+    @property
+    def next_month(self):
+        return f"{self.now.year + 1}-01" if self.now.month == 12 else f"{self.now.year}-{self.now.month + 1:02d}"
+
+    def period_range(self, period):
+        """(since, until) month bounds of an OVERVIEW_PERIODS period."""
+        if period == 'ytd':
+            return self.year_start, None
+        if period == 'month':
+            return self.this_month, self.next_month
+        return None, None
+
+def overview_widget(ctx, period='ytd'):
+    """
+    Headline numbers for the overview cards. totalSpend, receiptsCount and
+    categoriesCount cover `period`; ytdSpend and thisMonthSpend are always
+    included.
+    """
+    since, until = ctx.period_range(period)
+    categories = ctx.by_category if period == 'all' else ctx.rollups.by_category(since, until)
+    return {
+        "period": period,
+        "totalSpend": ctx.rollups.total(since, until),
+        "ytdSpend": ctx.rollups.total(since=ctx.year_start),
+        "thisMonthSpend": ctx.rollups.total(since=ctx.this_month, until=ctx.next_month),
+        "receiptsCount": ctx.rollups.receipts(since, until),
+        "categoriesCount": len(categories),
+        "currency": ctx.currency,
+        "status": "success"
+    }
+
+def category_ratios_widget(ctx):
+    total_spend = ctx.rollups.total() if ctx.rollups.has_receipts() else 1  # Avoid division by zero
+    return {
+        "category_ratios": [
+            {
+                "category": category,
+                "amount": amount,
+                "percentage": round((amount / total_spend) * 100 if total_spend > 0 else 0, 2)
+            }
+            for category, amount in ctx.by_category
+        ],
+        "total_spend": total_spend,
+        "status": "success"
+    }
+
+def summary_widget(ctx):
+    return {
+        "by_category": [{"_id": category, "total": total} for category, total in ctx.by_category],
+        "by_merchant": [{"_id": merchant, "total": total} for merchant, total in ctx.rollups.by_merchant()],
+        "by_payment_mode": [{"_id": mode, "total": total} for mode, total in ctx.rollups.by_payment_mode()],
+        "monthly_trend": [{"_id": month, "total": total} for month, total in ctx.monthly_totals],
+        "currency": ctx.currency
+    }
+
+def budget_widget(ctx):
+    # Receipts are converted to the default currency when they are stored
+    actual_total = ctx.rollups.converted_total(since=ctx.year_start)
+    monthly_budget = float((ctx.user or {}).get("monthly_budget", 0.0))
+    yearly_budget = float((ctx.user or {}).get("yearly_budget", 0.0))
+    return {
+        "actual": round(float(actual_total), 2),
+        "monthly_budget": round(monthly_budget, 2),
+        "yearly_budget": round(yearly_budget, 2),
+        "status": "over" if actual_total > yearly_budget else "within",
+        "currency": ctx.default_currency
+    }
+
+def tax_widget(ctx):
+    data = ctx.rollups.tax()
+    return {
+        "total_tax": round(float(data["converted_tax"]), 2),
+        "avg_tax_rate": round(float(data["avg_tax_rate"]), 2),
+        "receipts_with_tax": data["receipts_with_tax"],
+        "currency": ctx.default_currency
+    }
+
+def forecast_widget(ctx, model='sma'):
+    forecasts = forecast(ctx.monthly_totals, ctx.rollups.category_months(), model)
+    return {
+        "months": [month for month, _ in ctx.monthly_totals],
+        "totals": [round(float(total), 2) for _, total in ctx.monthly_totals],
+        "forecast_next_month": round(forecasts["forecast_next_month"], 2),
+        "category_forecasts": forecasts["category_forecasts"],
+        "model": model,
+        "currency": ctx.currency
+    }
+
+# Widgets /dashboard can return, by name
+DASHBOARD_WIDGETS = {
+    'overview': overview_widget,
+    'category_ratios': category_ratios_widget,
+    'summary': summary_widget,
+    'budget': budget_widget,
+    'tax': tax_widget,
+    'forecast': forecast_widget,
+}
+
+def dashboard_report(ctx, fields, model='sma', period='ytd'):
+    """
+    Build the requested widgets from one context. A widget that fails is
+    reported under "errors" and does not fail the others.
+    """
+    data = {}
+    errors = {}
+    for field in fields:
+        try:
+            if field == 'forecast':
+                data[field] = forecast_widget(ctx, model)
+            elif field == 'overview':
+                data[field] = overview_widget(ctx, period)
+            else:
+                data[field] = DASHBOARD_WIDGETS[field](ctx)
+        except Exception as e:
+            print(f"Error building dashboard widget {field}: {str(e)}")
+            errors[field] = str(e)
+    if errors:
+        data['errors'] = errors
+    return data
@@ -0,0 +1,123 @@
+# response_cache.py
+from functools import wraps
+from flask import request, g, current_app
+import threading
+import hashlib
+import json
+import os
+from dotenv import load_dotenv
+
+from ttl_cache import TTLCache
+
+load_dotenv()
+
+# Seconds a cached dashboard response is served; also bounds how long other
+# workers can serve a stale response when there is no shared backend
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 30))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2048))
+# redis://... to share cached responses and user versions between workers
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+
+class LocalBackend:
+    """Per-process LRU of responses and per-user version counters."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self._entries = TTLCache(max_entries, ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, entry):
+        self._entries.put(key, entry)
+
+    def version(self, user):
+        with self._lock:
+            return self._versions.get(user, 0)
+
+    def bump(self, user):
+        with self._lock:
+            self._versions[user] = self._versions.get(user, 0) + 1
+
+class RedisBackend:
+    """Responses and versions in Redis, shared by every worker."""
+
+    def __init__(self, url, ttl=RESPONSE_CACHE_TTL):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self._redis.get(f"response:{key}")
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, entry):
+        self._redis.set(f"response:{key}", json.dumps(entry), ex=self.ttl)
+
+    def version(self, user):
+        return int(self._redis.get(f"response-version:{user}") or 0)
+
+    def bump(self, user):
+        self._redis.incr(f"response-version:{user}")
+
+class ResponseCache:
+    """
+    Per-user cache of JSON GET responses. Entries are keyed by user,
+    the user's version counter, path and query string, so bumping the
+    version after a write makes every earlier entry unreachable. Hits
+    and misses both carry an ETag, and a matching If-None-Match gets a
+    304 with no body.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def bump(self, user):
+        """Invalidate everything cached for a user; call after their data changes."""
+        try:
+            self.backend.bump(user)
+        except Exception as e:
+            print(f"Error bumping response cache version for {user}: {str(e)}")
+
+    def _key(self, user):
+        args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        return f"{user}:{self.backend.version(user)}:{request.path}?{args}"
+
+    def _respond(self, entry):
+        response = current_app.response_class(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+        response.set_etag(entry['etag'])
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+
+    def cached(self, view):
+        """Cache a view's 200 responses; needs g.user from require_auth."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                key = self._key(g.user["email"])
+                entry = self.backend.get(key)
+            except Exception as e:
+                print(f"Error reading response cache: {str(e)}")
+                return view(*args, **kwargs)
+            if entry is not None:
+                return self._respond(entry)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data(as_text=True)
+            entry = {
+                'body': body,
+                'status': 200,
+                'mimetype': response.mimetype,
+                'etag': hashlib.sha1(body.encode('utf-8')).hexdigest()
+            }
+            try:
+                self.backend.set(key, entry)
+            except Exception as e:
+                print(f"Error writing response cache: {str(e)}")
+            return self._respond(entry)
+        return wrapper
+
+response_cache = ResponseCache(RedisBackend(RESPONSE_CACHE_URL) if RESPONSE_CACHE_URL else LocalBackend())
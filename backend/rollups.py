@@ -0,0 +1,333 @@
+# rollups.py
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pymongo import UpdateOne, ReplaceOne, ReturnDocument
+import uuid
+import os
+from dotenv import load_dotenv
+
+from db import expenses_collection, rollups_collection
+from ttl_cache import TTLCache
+
+load_dotenv()
+
+# Seconds a worker trusts its in-memory copy of a user's running totals;
+# its own inserts always refresh it, this bounds staleness from other workers
+ROLLUP_TOTALS_TTL = int(os.getenv("ROLLUP_TOTALS_TTL", 30))
+# Seconds a rebuild holds a user's rollups before another may take over,
+# in case the worker running it died
+ROLLUP_REBUILD_LEASE = int(os.getenv("ROLLUP_REBUILD_LEASE", 300))
+# Times a rebuild starts over because receipts were recorded while it ran
+ROLLUP_REBUILD_ATTEMPTS = int(os.getenv("ROLLUP_REBUILD_ATTEMPTS", 5))
+
+# Rollup rows, one per (email, kind, month, key):
+#   month     key ""            total, tax, tax_percent_sum, receipts, receipts_with_tax, currencies.<code>,
+#                               converted_total, converted_tax (in the user's default currency)
+#   category  key category      amount
+#   merchant  key merchant      total
+#   payment   key payment mode  total
+#   totals    month "", key ""  all-time total, receipts, categories.<category key>
+#   state     month "", key ""  writes (record_receipts calls), rebuilds, lease, lease_until
+
+# Receipt fields the rollups are built from
+ROLLUP_FIELDS = {'email': 1, 'created_at': 1, 'total': 1, 'tax': 1, 'tax_percent': 1, 'currency': 1,
+                 'merchant': 1, 'payment_mode': 1, 'items.category': 1, 'items.amount': 1,
+                 'converted_total': 1, 'converted_tax': 1}
+
+def category_field(category):
+    # Prefixed and with "." / "$" swapped out so any category is a valid field name
+    return '_' + category.replace('.', '\uff0e').replace('$', '\uff04')
+
+def category_from_field(field):
+    return field[1:].replace('\uff0e', '.').replace('\uff04', '$')
+
+def month_key(created_at):
+    return (created_at or datetime.utcnow()).strftime('%Y-%m')
+
+def rollup_increments(receipts):
+    """Fold receipts into {(email, kind, month, key): {field: increment}}."""
+    increments = defaultdict(lambda: defaultdict(float))
+    for receipt in receipts:
+        email = receipt['email']
+        month = month_key(receipt.get('created_at'))
+        total = receipt.get('total') or 0
+        tax = receipt.get('tax') or 0
+
+        totals_row = increments[(email, 'totals', '', '')]
+        totals_row['total'] += total
+        totals_row['receipts'] += 1
+
+        month_row = increments[(email, 'month', month, '')]
+        month_row['total'] += total
+        month_row['tax'] += tax
+        month_row['tax_percent_sum'] += receipt.get('tax_percent') or 0
+        month_row['receipts'] += 1
+        month_row['receipts_with_tax'] += 1 if tax > 0 else 0
+        currency = receipt.get('currency')
+        if isinstance(currency, str) and currency and '.' not in currency and not currency.startswith('$'):
+            month_row[f'currencies.{currency}'] += 1
+        month_row['converted_total'] += receipt.get('converted_total') or 0
+        month_row['converted_tax'] += receipt.get('converted_tax') or 0
+
+        merchant = receipt.get('merchant')
+        increments[(email, 'merchant', month, 'unknown' if merchant is None else merchant)]['total'] += total
+        payment_mode = receipt.get('payment_mode')
+        increments[(email, 'payment', month, 'unknown' if payment_mode is None else payment_mode)]['total'] += total
+
+        # Receipts without items still count towards "uncategorized", as $unwind with
+        # preserveNullAndEmptyArrays did in the raw aggregations
+        for item in receipt.get('items') or [None]:
+            item = item or {}
+            category = item.get('category')
+            if category is None:
+                category = 'uncategorized'
+            increments[(email, 'category', month, category)]['amount'] += item.get('amount') or 0
+            totals_row[f'categories.{category_field(category)}'] += item.get('amount') or 0
+    return increments
+
+def record_receipts(receipts):
+    """
+    Add freshly inserted receipts to the rollups with atomic $inc upserts.
+    The totals row comes back from its update, so the running totals
+    cached for the user are exact without another read.
+    """
+    increments = rollup_increments(receipts)
+    emails = {email for email, _, _, _ in increments}
+    before = {email: rebuild_state(email) for email in emails}
+    ops = []
+    totals = {}
+    for (email, kind, month, key), fields in increments.items():
+        if kind == 'totals':
+            totals[email] = fields
+            continue
+        ops.append(UpdateOne(
+            {'email': email, 'kind': kind, 'month': month, 'key': key},
+            {'$inc': dict(fields)},
+            upsert=True
+        ))
+    if ops:
+        rollups_collection.bulk_write(ops, ordered=False)
+
+    for email, fields in totals.items():
+        doc = rollups_collection.find_one_and_update(
+            {'email': email, 'kind': 'totals', 'month': '', 'key': ''},
+            {'$inc': dict(fields)},
+            projection={'_id': 0, 'total': 1, 'receipts': 1, 'categories': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        # A totals row this batch just created may sit on top of receipts stored
+        # before rollups existed; rebuild the user from scratch in that case
+        if doc['receipts'] == fields['receipts'] and \
+                expenses_collection.count_documents({'email': email}, limit=int(fields['receipts']) + 1) > fields['receipts']:
+            rebuild_rollups(email)
+            emails.discard(email)
+            continue
+        totals_cache.put(email, totals_from_doc(doc))
+
+    for email in emails:
+        after = rollups_collection.find_one_and_update(
+            state_query(email),
+            {'$inc': {'writes': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        # A rebuild still running sees the new write count and starts over. One that
+        # ran alongside these increments and already finished may have counted the
+        # receipts twice, so rebuild again.
+        if not lease_held(after) and (lease_held(before[email]) or
+                                      after.get('rebuilds', 0) != (before[email] or {}).get('rebuilds', 0)):
+            rebuild_rollups(email)
+
+totals_cache = TTLCache(4096, ROLLUP_TOTALS_TTL)
+
+def totals_from_doc(doc):
+    doc = doc or {}
+    return {
+        'total': doc.get('total', 0),
+        'receipts': int(doc.get('receipts', 0)),
+        'categories': {category_from_field(field): amount for field, amount in (doc.get('categories') or {}).items()}
+    }
+
+def user_totals(email):
+    """
+    All-time spend, receipt count and per-category amounts for a user,
+    from memory when fresh and otherwise from their totals row.
+    """
+    totals = totals_cache.get(email)
+    if totals is None:
+        query = {'email': email, 'kind': 'totals', 'month': '', 'key': ''}
+        projection = {'_id': 0, 'total': 1, 'receipts': 1, 'categories': 1}
+        doc = rollups_collection.find_one(query, projection)
+        if doc is None and expenses_collection.find_one({'email': email}, {'_id': 1}):
+            rebuild_rollups(email)
+            doc = rollups_collection.find_one(query, projection)
+        totals = totals_from_doc(doc)
+        totals_cache.put(email, totals)
+    return totals
+
+def rollup_docs(increments):
+    """Turn rollup_increments() output into rollup documents."""
+    docs = []
+    for (email, kind, month, key), fields in increments.items():
+        doc = {'email': email, 'kind': kind, 'month': month, 'key': key}
+        for field, value in fields.items():
+            if '.' in field:
+                parent, child = field.split('.', 1)
+                doc.setdefault(parent, {})[child] = value
+            else:
+                doc[field] = value
+        docs.append(doc)
+    return docs
+
+def state_query(email):
+    return {'email': email, 'kind': 'state', 'month': '', 'key': ''}
+
+def rebuild_state(email):
+    return rollups_collection.find_one(state_query(email), {'_id': 0, 'rebuilds': 1, 'lease': 1, 'lease_until': 1})
+
+def lease_held(state):
+    return bool(state and state.get('lease') and state.get('lease_until') and state['lease_until'] > datetime.utcnow())
+
+def rebuild_user(email):
+    """
+    Recompute one user's rollups while holding their rebuild lease. Rows are
+    replaced in place and stamped with the lease token, then rows the rebuild
+    did not produce are dropped, so the unique index never sees a gap that a
+    concurrent $inc upsert could fill. If receipts are recorded meanwhile
+    (the state row's write count moves) the rebuild starts over. When another
+    rebuild holds the lease, bumping the write count makes it start over
+    instead. Returns False in that case.
+    """
+    token = uuid.uuid4().hex
+    query = state_query(email)
+    rollups_collection.update_one(query, {'$setOnInsert': {'writes': 0, 'rebuilds': 0}}, upsert=True)
+    state = rollups_collection.find_one_and_update(
+        dict(query, **{'$or': [{'lease': None}, {'lease_until': {'$lt': datetime.utcnow()}}]}),
+        {'$set': {'lease': token, 'lease_until': datetime.utcnow() + timedelta(seconds=ROLLUP_REBUILD_LEASE)},
+         '$inc': {'rebuilds': 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if state is None:
+        rollups_collection.update_one(query, {'$inc': {'writes': 1}})
+        return False
+
+    for attempt in range(ROLLUP_REBUILD_ATTEMPTS):
+        writes = state.get('writes', 0)
+        cursor = expenses_collection.find({'email': email}, ROLLUP_FIELDS).batch_size(1000)
+        ops = [ReplaceOne({'email': email, 'kind': doc['kind'], 'month': doc['month'], 'key': doc['key']},
+                          dict(doc, rebuild=token), upsert=True)
+               for doc in rollup_docs(rollup_increments(cursor))]
+        for start in range(0, len(ops), 1000):
+            rollups_collection.bulk_write(ops[start:start + 1000], ordered=False)
+        rollups_collection.delete_many({'email': email, 'kind': {'$ne': 'state'}, 'rebuild': {'$ne': token}})
+
+        # Release only if nothing was recorded since this attempt read the receipts
+        released = rollups_collection.find_one_and_update(
+            dict(query, lease=token, writes=writes),
+            {'$set': {'lease': None, 'lease_until': None}}
+        )
+        if released is not None:
+            break
+        state = rollups_collection.find_one(query)
+    else:
+        print(f"Rollups for {email} still changing after {ROLLUP_REBUILD_ATTEMPTS} rebuilds; releasing")
+        rollups_collection.update_one(dict(query, lease=token), {'$set': {'lease': None, 'lease_until': None}})
+    totals_cache.pop(email)
+    return True
+
+def rebuild_rollups(email=None):
+    """
+    Recompute rollups from raw receipts, for one user or for everyone.
+    Receipts are streamed one user at a time, so memory stays bounded by
+    one user's rollup rows. Returns the number of users rebuilt.
+    """
+    emails = [email] if email else expenses_collection.distinct('email')
+    for user_email in emails:
+        rebuild_user(user_email)
+    return len(emails)
+
+class RollupView:
+    """Read helpers over one user's rollup rows."""
+
+    def __init__(self, docs):
+        self.month_rows = {}
+        self.rows = defaultdict(list)
+        for doc in docs:
+            if doc['kind'] == 'month':
+                self.month_rows[doc['month']] = doc
+            elif doc['kind'] != 'state':
+                self.rows[doc['kind']].append(doc)
+
+    @staticmethod
+    def _in_range(month, since=None, until=None):
+        return (since is None or month >= since) and (until is None or month < until)
+
+    def has_receipts(self):
+        return bool(self.month_rows)
+
+    def total(self, since=None, until=None, field='total'):
+        return sum(row.get(field, 0) for month, row in self.month_rows.items() if self._in_range(month, since, until))
+
+    def converted_total(self, since=None, until=None):
+        """Spend in the user's default currency, converted at ingest."""
+        return self.total(since, until, field='converted_total')
+
+    def receipts(self, since=None, until=None):
+        return int(sum(row.get('receipts', 0) for month, row in self.month_rows.items() if self._in_range(month, since, until)))
+
+    def _sum_by_key(self, kind, field, since=None, until=None):
+        sums = defaultdict(float)
+        for row in self.rows[kind]:
+            if self._in_range(row['month'], since, until):
+                sums[row['key']] += row.get(field, 0)
+        return sums
+
+    def by_category(self, since=None, until=None):
+        """[(category, amount)] sorted by amount, largest first."""
+        return sorted(self._sum_by_key('category', 'amount', since, until).items(), key=lambda kv: kv[1], reverse=True)
+
+    def by_merchant(self):
+        return sorted(self._sum_by_key('merchant', 'total').items(), key=lambda kv: kv[1], reverse=True)
+
+    def by_payment_mode(self):
+        return list(self._sum_by_key('payment', 'total').items())
+
+    def monthly_totals(self):
+        """[(month, total)] in month order."""
+        return [(month, self.month_rows[month].get('total', 0)) for month in sorted(self.month_rows)]
+
+    def category_months(self):
+        """{category: {month: amount}}"""
+        result = defaultdict(dict)
+        for row in self.rows['category']:
+            result[row['key']][row['month']] = result[row['key']].get(row['month'], 0) + row.get('amount', 0)
+        return result
+
+    def tax(self):
+        receipts = self.receipts()
+        return {
+            'total_tax': sum(row.get('tax', 0) for row in self.month_rows.values()),
+            'converted_tax': sum(row.get('converted_tax', 0) for row in self.month_rows.values()),
+            'avg_tax_rate': sum(row.get('tax_percent_sum', 0) for row in self.month_rows.values()) / receipts if receipts else 0,
+            'receipts_with_tax': int(sum(row.get('receipts_with_tax', 0) for row in self.month_rows.values()))
+        }
+
+    def currency(self):
+        """Most common receipt currency, or None when there are no receipts."""
+        counts = defaultdict(float)
+        for row in self.month_rows.values():
+            for code, count in (row.get('currencies') or {}).items():
+                counts[code] += count
+        return max(counts.items(), key=lambda kv: kv[1])[0] if counts else None
+
+def load_rollups(email):
+    """
+    Load a user's rollups with one indexed query. Users with receipts but
+    no totals row yet (stored before rollups existed) are backfilled first.
+    """
+    docs = list(rollups_collection.find({'email': email}, {'_id': 0}))
+    if not any(doc['kind'] == 'totals' for doc in docs) and expenses_collection.find_one({'email': email}, {'_id': 1}):
+        rebuild_rollups(email)
+        docs = list(rollups_collection.find({'email': email}, {'_id': 0}))
+    return RollupView(docs)
@@ -1,18 +1,25 @@
 # receipt.py
-from flask import Blueprint, request, jsonify
-from PIL import Image
-import pytesseract
-import cv2
-import numpy as np
-from pdf2image import convert_from_bytes
-import io
+from flask import Blueprint, request, jsonify, url_for, g, Response, stream_with_context
 import traceback
 from datetime import datetime
-import re
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from routes.user import get_exchange_rate
+import zipfile
+import io
+from ocr import extract_text, SUPPORTED_CONTENT_TYPES
+from jobs import ocr_jobs, QueueFull
+from ocr_cache import ocr_cache, content_hash
+from receipt_parser import parse_receipt
+from rollups import record_receipts, rebuild_rollups, user_totals
+from conversions import convert_receipt, user_currency, retry_conversion
+from auth import require_auth
+from mailer import mailer
+from alert_state import claim_alerts
+from forecasting import FORECAST_MODELS
+from reports import (ReportContext, DASHBOARD_WIDGETS, OVERVIEW_PERIODS, dashboard_report, overview_widget, category_ratios_widget,
+                     summary_widget, budget_widget, tax_widget, forecast_widget)
+from response_cache import response_cache
+from receipt_queries import (receipt_filters, after_cursor, encode_cursor, RECEIPT_SORT, SUMMARY_FIELDS,
+                             RECEIPT_PAGE_SIZE, RECEIPT_PAGE_MAX)
+from exports import EXPORT_FORMATS, EXPORT_WRITERS, EXPORT_FIELDS, EXPORT_SORT, EXPORT_BATCH_SIZE, EXPORT_BATCH_MAX
 import os
 from dotenv import load_dotenv
 
@@ -20,39 +27,24 @@ load_dotenv()
 
 receipt_bp = Blueprint('receipt', __name__)
 
-POPLER_PATH = r"C:\Users\panth\Downloads\Release-25.07.0-0\poppler-25.07.0\Library\bin"
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-
 try:
     from db import expenses_collection
 except Exception as e:
     print(f"Error importing expenses_collection: {str(e)}")
     expenses_collection = None
 
-# Email configuration
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
-SMTP_USERNAME = os.getenv("SMTP_USERNAME")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+# Return the stored receipt instead of inserting the same file twice for a user
+DEDUPE_UPLOADS = os.getenv("DEDUPE_UPLOADS", "True").lower() == "true"
 
-def send_email(to_email, subject, body):
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = SMTP_USERNAME
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.sendmail(SMTP_USERNAME, to_email, msg.as_string())
-        server.quit()
-        print(f"Email sent to {to_email}")
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
+# Limits for /upload/batch, counted after zip archives are expanded
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 200))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", 200 * 1024 * 1024))
+# Receipts a batch job hands to the OCR queue at a time (capped at OCR_MAX_QUEUE)
+BATCH_OCR_CHUNK = int(os.getenv("BATCH_OCR_CHUNK", 16))
+EXTENSION_CONTENT_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.pdf': 'application/pdf'}
 
 @receipt_bp.route('/upload', methods=['POST'])
+@require_auth
 def upload_receipt():
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -61,52 +53,51 @@ def upload_receipt():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
-    email = request.form.get("email")
-    if not email:
-        return jsonify({'error': 'Email is required'}), 400
+    email = g.user["email"]
 
-    try:
-        file_bytes = file.read()
-        images = []
+    if file.content_type not in SUPPORTED_CONTENT_TYPES:
+        return jsonify({'error': 'Unsupported file type'}), 400
 
-        if file.content_type in ['image/jpeg', 'image/png']:
-            img = Image.open(io.BytesIO(file_bytes))
-            images = [img]
-        elif file.content_type == 'application/pdf':
-            images = convert_from_bytes(file_bytes, poppler_path=POPLER_PATH)
-        else:
-            return jsonify({'error': 'Unsupported file type'}), 400
-
-        text = ''
-        for img in images:
-            open_cv_image = np.array(img)
-            gray = cv2.cvtColor(open_cv_image, cv2.COLOR_BGR2GRAY)
-            thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-            text += pytesseract.image_to_string(thresh) + '\n\n'
-
-        data = parse_receipt(text)
-        data['created_at'] = datetime.utcnow()
-        data['email'] = email
-        result = expenses_collection.insert_one(data)
-        data['_id'] = str(result.inserted_id)
-
-        # Check budget alerts after uploading a receipt
-        alerts_response = check_budget_alerts_internal(email)
-        if alerts_response['has_alerts']:
-            user = expenses_collection.database["users"].find_one({"email": email})
-            if user and user.get("notifications", {}).get("email", True):
-                for alert in alerts_response['alerts']:
-                    subject = f"Budget Alert: {alert['category']} Exceeded"
-                    body = (
-                        f"Dear {user.get('username', 'User')},\n\n"
-                        f"Your spending in the '{alert['category']}' category has exceeded your budget.\n"
-                        f"Current: {alert['current_percentage']}% | Budget: {alert['budget_percentage']}%\n"
-                        f"Overspend: {alert['overspend_amount']:.2f}%\n\n"
-                        f"Please review your spending in the dashboard.\n"
-                        f"Best,\nReceipt Scanner Team"
-                    )
-                    send_email(email, subject, body)
+    run_async = request_flag("async")
+    allow_duplicate = request_flag("allow_duplicate")
 
+    try:
+        file_bytes = file.read()
+        digest = content_hash(file_bytes)
+
+        if DEDUPE_UPLOADS and not allow_duplicate:
+            existing = expenses_collection.find_one({"email": email, "content_hash": digest})
+            if existing:
+                existing['_id'] = str(existing['_id'])
+                existing['duplicate'] = True
+                return jsonify(existing), 200
+
+        cached = ocr_cache.get(digest)
+        if cached:
+            data = save_receipt(parse_receipt(cached['text']), email, digest)
+            data['ocr_pages'] = cached['ocr_pages']
+            data['cached'] = True
+            return jsonify(data), 200
+
+        if run_async:
+            try:
+                job_id = ocr_jobs.submit(
+                    file_bytes,
+                    file.content_type,
+                    lambda text, pages: save_receipt(parse_and_cache(digest, text, pages), email, digest),
+                    owner=email
+                )
+            except QueueFull as e:
+                return jsonify({'error': str(e)}), 429, {'Retry-After': '5'}
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': url_for('receipt.get_receipt_job', job_id=job_id)
+            }), 202
+
+        text, pages = extract_text(file_bytes, file.content_type)
+        data = save_receipt(parse_and_cache(digest, text, pages), email, digest)
+        data['ocr_pages'] = pages
         return jsonify(data), 200
 
     except Exception as e:
@@ -114,6 +105,247 @@ def upload_receipt():
         traceback.print_exc()
         return jsonify({'error': f'Failed to process receipt: {str(e)}'}), 500
 
+@receipt_bp.route('/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_receipt_job(job_id):
+    job = ocr_jobs.get(job_id, owner=g.user["email"])
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
+
+def request_flag(name):
+    value = request.args.get(name) or request.form.get(name) or ""
+    return value.lower() in ("1", "true", "yes")
+
+# Remember the OCR text for identical uploads and parse it
+def parse_and_cache(digest, text, pages):
+    ocr_cache.put(digest, text, pages)
+    return parse_receipt(text)
+
+# Store a parsed receipt and send any budget alerts
+def save_receipt(data, email, digest=None):
+    data['created_at'] = datetime.utcnow()
+    data['email'] = email
+    if digest:
+        data['content_hash'] = digest
+    converted = convert_receipt(data, user_currency(email))
+    result = expenses_collection.insert_one(data)
+    data['_id'] = str(result.inserted_id)
+    record_receipts_safely([data], email)
+    response_cache.bump(email)
+    if not converted:
+        # Budget and tax reports count it once a rate is available again
+        retry_conversion(email)
+        data['conversion_pending'] = True
+
+    # Check budget alerts after uploading a receipt
+    notify_budget_alerts(email)
+    return data
+
+# The receipts are stored by now, so a rollup failure must not fail the upload: the client
+# would retry and be told it is a duplicate. Recompute the user's rollups from receipts instead.
+def record_receipts_safely(receipts, email):
+    try:
+        record_receipts(receipts)
+    except Exception as e:
+        print(f"Error recording rollups for {email}, rebuilding: {str(e)}")
+        traceback.print_exc()
+        try:
+            rebuild_rollups(email)
+        except Exception as e:
+            print(f"Error rebuilding rollups for {email}; run `flask rebuild-rollups --email {email}`: {str(e)}")
+            traceback.print_exc()
+
+# Evaluate budget alerts for a user and queue one email covering the ones not yet sent
+def notify_budget_alerts(email):
+    alerts_response = check_budget_alerts_internal(email)
+    if 'error' in alerts_response:
+        return alerts_response
+    new_alerts = claim_alerts(email, alerts_response['alerts'])
+    if new_alerts:
+        user = expenses_collection.database["users"].find_one({"email": email}, {"username": 1, "notifications": 1})
+        if user and user.get("notifications", {}).get("email", True):
+            subject, body = budget_alert_digest(user, new_alerts)
+            mailer.send(email, subject, body)
+    return alerts_response
+
+def budget_alert_digest(user, alerts):
+    if len(alerts) == 1:
+        subject = f"Budget Alert: {alerts[0]['category']} Exceeded"
+        intro = f"Your spending in the '{alerts[0]['category']}' category has exceeded your budget.\n"
+    else:
+        subject = f"Budget Alert: {len(alerts)} Categories Exceeded"
+        intro = "Your spending in the following categories has exceeded your budget.\n"
+    lines = [
+        f"- {alert['category']}: Current: {alert['current_percentage']}% | Budget: {alert['budget_percentage']}% | "
+        f"Overspend: {alert['overspend_amount']:.2f}%"
+        for alert in alerts
+    ]
+    body = (
+        f"Dear {user.get('username', 'User')},\n\n"
+        f"{intro}"
+        + "\n".join(lines) + "\n\n"
+        f"Please review your spending in the dashboard.\n"
+        f"Best,\nReceipt Scanner Team"
+    )
+    return subject, body
+
+def collect_batch_files():
+    """
+    Gather (filename, content_type, bytes) for every receipt in the request,
+    expanding zip archives, plus an error entry for each archive member that
+    is not a receipt image or PDF. Raises ValueError when the batch is over
+    limits.
+    """
+    entries = []
+    skipped = []
+    total_bytes = 0
+    for file in request.files.getlist('files') + request.files.getlist('file'):
+        if not file.filename:
+            continue
+        if file.content_type in ('application/zip', 'application/x-zip-compressed') or file.filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(file.read())) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    content_type = EXTENSION_CONTENT_TYPES.get(os.path.splitext(info.filename)[1].lower())
+                    if not content_type:
+                        skipped.append({'filename': info.filename, 'error': 'Not a receipt image or PDF'})
+                        continue
+                    total_bytes += info.file_size
+                    if total_bytes > BATCH_MAX_BYTES:
+                        raise ValueError(f'Batch exceeds {BATCH_MAX_BYTES} bytes')
+                    entries.append((info.filename, content_type, archive.read(info)))
+        else:
+            file_bytes = file.read()
+            total_bytes += len(file_bytes)
+            if total_bytes > BATCH_MAX_BYTES:
+                raise ValueError(f'Batch exceeds {BATCH_MAX_BYTES} bytes')
+            entries.append((file.filename, file.content_type, file_bytes))
+        if len(entries) > BATCH_MAX_FILES:
+            raise ValueError(f'A batch can contain at most {BATCH_MAX_FILES} receipts')
+    return entries, skipped
+
+@receipt_bp.route('/upload/batch', methods=['POST'])
+@require_auth
+def upload_receipts_batch():
+    """
+    Queue files and zip archives of receipts as one background job. Responds
+    202 with a status_url; the finished job's result is the batch report
+    (inserted receipts, duplicates, errors and budget alerts).
+    """
+    email = g.user["email"]
+
+    try:
+        entries, skipped = collect_batch_files()
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({'error': str(e)}), 400
+    if not entries:
+        return jsonify({'error': 'No receipts uploaded', 'errors': skipped}), 400
+
+    allow_duplicate = request_flag("allow_duplicate")
+
+    try:
+        job_id = ocr_jobs.submit_batch(lambda: process_batch(entries, skipped, email, allow_duplicate), owner=email)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429, {'Retry-After': '5'}
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'files': len(entries),
+        'status_url': url_for('receipt.get_receipt_job', job_id=job_id)
+    }), 202
+
+# OCR (file_bytes, content_type) pairs a chunk at a time, each chunk waiting for room in
+# the OCR queue; returns (text, pages) or the exception for each pair, in order
+def ocr_batch(to_ocr):
+    chunk_size = max(1, min(BATCH_OCR_CHUNK, ocr_jobs.max_queue))
+    results = []
+    for start in range(0, len(to_ocr), chunk_size):
+        for future in ocr_jobs.map(to_ocr[start:start + chunk_size], wait=True):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+    return results
+
+# Dedupe, OCR, store and alert for one batch job; returns the batch report
+def process_batch(entries, skipped, email, allow_duplicate):
+    errors = list(skipped)
+    duplicates = []
+    known = set()
+    if DEDUPE_UPLOADS and not allow_duplicate:
+        digests = [content_hash(file_bytes) for _, _, file_bytes in entries]
+        for doc in expenses_collection.find({"email": email, "content_hash": {"$in": digests}}, {"content_hash": 1}):
+            known.add(doc['content_hash'])
+
+    # OCR everything that is not a duplicate or already cached
+    pending = []
+    to_ocr = []
+    for filename, content_type, file_bytes in entries:
+        if content_type not in SUPPORTED_CONTENT_TYPES:
+            errors.append({'filename': filename, 'error': 'Unsupported file type'})
+            continue
+        digest = content_hash(file_bytes)
+        if digest in known:
+            duplicates.append({'filename': filename, 'content_hash': digest})
+            continue
+        if DEDUPE_UPLOADS and not allow_duplicate:
+            known.add(digest)
+        cached = ocr_cache.get(digest)
+        if cached:
+            pending.append((filename, digest, parse_receipt(cached['text']), None))
+        else:
+            pending.append((filename, digest, None, len(to_ocr)))
+            to_ocr.append((file_bytes, content_type))
+    ocr_results = ocr_batch(to_ocr)
+
+    docs = []
+    filenames = []
+    unconverted = []
+    now = datetime.utcnow()
+    default_currency = user_currency(email)
+    for filename, digest, parsed, ocr_index in pending:
+        try:
+            if ocr_index is not None:
+                if isinstance(ocr_results[ocr_index], Exception):
+                    raise ocr_results[ocr_index]
+                text, pages = ocr_results[ocr_index]
+                parsed = parse_and_cache(digest, text, pages)
+        except Exception as e:
+            print(f"Error processing {filename} in batch: {str(e)}")
+            errors.append({'filename': filename, 'error': str(e)})
+            continue
+        parsed['created_at'] = now
+        parsed['email'] = email
+        parsed['content_hash'] = digest
+        if not convert_receipt(parsed, default_currency):
+            unconverted.append(parsed)
+        docs.append(parsed)
+        filenames.append(filename)
+
+    if docs:
+        result = expenses_collection.insert_many(docs)
+        for doc, inserted_id in zip(docs, result.inserted_ids):
+            doc['_id'] = str(inserted_id)
+        record_receipts_safely(docs, email)
+        response_cache.bump(email)
+        if unconverted:
+            retry_conversion(email)
+            for doc in unconverted:
+                doc['conversion_pending'] = True
+
+    # One alert evaluation for the whole batch
+    alerts_response = notify_budget_alerts(email) if docs else {'alerts': [], 'has_alerts': False}
+
+    return {
+        'inserted': len(docs),
+        'receipts': [dict(doc, filename=filename) for doc, filename in zip(docs, filenames)],
+        'duplicates': duplicates,
+        'errors': errors,
+        'alerts': alerts_response.get('alerts', [])
+    }
+
 # Internal function to check budget alerts
 def check_budget_alerts_internal(email):
     try:
@@ -121,36 +353,23 @@ def check_budget_alerts_internal(email):
             return {"error": "Database not initialized", "alerts": [], "has_alerts": False}
 
         # Get user's budget preferences
-        user = expenses_collection.database["users"].find_one({"email": email})
+        user = expenses_collection.database["users"].find_one({"email": email}, {"budget_preferences": 1})
         if not user:
             return {"error": "User not found", "alerts": [], "has_alerts": False}
 
         budget_preferences = user.get("budget_preferences", {})
+        if not any(budget_preferences.values()):
+            return {"alerts": [], "has_alerts": False, "status": "success"}
 
-        # Get current category ratios
-        pipeline_total = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}
-        ]
-        total_result = list(expenses_collection.aggregate(pipeline_total))
-        total_spend = total_result[0]["total"] if total_result else 1  # Avoid division by zero
-
-        pipeline_category = [
-            {"$match": {"email": email}},
-            {"$unwind": {"path": "$items", "preserveNullAndEmptyArrays": True}},
-            {"$group": {
-                "_id": {"$ifNull": ["$items.category", "uncategorized"]},
-                "amount": {"$sum": {"$ifNull": ["$items.amount", 0]}}
-            }},
-            {"$sort": {"amount": -1}}
-        ]
-        category_data = list(expenses_collection.aggregate(pipeline_category))
+        # Running all-time totals, already updated in memory by the upload that triggered this check
+        totals = user_totals(email)
+        total_spend = totals['total'] if totals['receipts'] else 1  # Avoid division by zero
+        category_data = sorted(totals['categories'].items(), key=lambda kv: kv[1], reverse=True)
 
         # Check for exceeded budgets
         alerts = []
-        for category in category_data:
-            category_name = category["_id"]
-            current_percentage = (category["amount"] / total_spend) * 100 if total_spend > 0 else 0
+        for category_name, amount in category_data:
+            current_percentage = (amount / total_spend) * 100 if total_spend > 0 else 0
             budget_percentage = budget_preferences.get(category_name, 0)
 
             if budget_percentage and current_percentage > budget_percentage:
@@ -173,14 +392,13 @@ def check_budget_alerts_internal(email):
         return {"error": f"Failed to check budget alerts: {str(e)}", "alerts": [], "has_alerts": False}
 
 @receipt_bp.route('/check-budget-alerts', methods=['GET'])
+@require_auth
 def check_budget_alerts():
     try:
         if expenses_collection is None:
             return jsonify({"error": "Database not initialized"}), 500
         
-        email = request.args.get("email")
-        if not email:
-            return jsonify({"error": "Email is required"}), 400
+        email = g.user["email"]
 
         alerts_response = check_budget_alerts_internal(email)
         if "error" in alerts_response:
@@ -194,16 +412,17 @@ def check_budget_alerts():
         return jsonify({"error": f"Failed to check budget alerts: {str(e)}"}), 500
 
 @receipt_bp.route('/set-budget-preferences', methods=['POST'])
+@require_auth
 def set_budget_preferences():
     try:
         if expenses_collection is None:
             return jsonify({"error": "Database not initialized"}), 500
         
-        email = request.json.get("email")
+        email = g.user["email"]
         preferences = request.json.get("preferences")
         
-        if not email or not preferences:
-            return jsonify({"error": "Email and preferences are required"}), 400
+        if not preferences:
+            return jsonify({"error": "Preferences are required"}), 400
 
         # Validate preferences
         total_percentage = sum(float(p) for p in preferences.values() if p)
@@ -218,22 +437,9 @@ def set_budget_preferences():
         )
 
         if result.modified_count > 0 or result.upserted_id:
+            response_cache.bump(email)
             # Check for alerts after updating preferences
-            alerts_response = check_budget_alerts_internal(email)
-            if alerts_response['has_alerts']:
-                user = expenses_collection.database["users"].find_one({"email": email})
-                if user and user.get("notifications", {}).get("email", True):
-                    for alert in alerts_response['alerts']:
-                        subject = f"Budget Alert: {alert['category']} Exceeded"
-                        body = (
-                            f"Dear {user.get('username', 'User')},\n\n"
-                            f"Your spending in the '{alert['category']}' category has exceeded your budget.\n"
-                            f"Current: {alert['current_percentage']}% | Budget: {alert['budget_percentage']}%\n"
-                            f"Overspend: {alert['overspend_amount']:.2f}%\n\n"
-                            f"Please review your spending in the dashboard.\n"
-                            f"Best,\nReceipt Scanner Team"
-                        )
-                        send_email(email, subject, body)
+            notify_budget_alerts(email)
 
             return jsonify({
                 "message": "Budget preferences updated successfully",
@@ -247,219 +453,6 @@ def set_budget_preferences():
         traceback.print_exc()
         return jsonify({"error": f"Failed to set budget preferences: {str(e)}"}), 500
 
-def normalize_currency(symbol, code):
-    mapping = {"INR": "₹", "USD": "$", "EUR": "€", "GBP": "£"}
-    if symbol and symbol in mapping.values():
-        return symbol
-    if code:
-        return mapping.get(code.upper(), code.upper())
-    return "₹"
-
-def parse_receipt(text):
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
-
-    data = {
-        'merchant': '',
-        'date': '',
-        'currency': '₹',
-        'subtotal': 0.0,
-        'tax': 0.0,
-        'tax_percent': 0.0,
-        'total': 0.0,
-        'items': []
-    }
-
-    date_patterns = [
-        re.compile(r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b'),
-        re.compile(r'\b(\d{4}[/-]\d{1,2}[/-]\d{1,2})\b'),
-        re.compile(r'([A-Za-z]{3,9}\s+\d{1,2},?\s+\d{4})')
-    ]
-    amount_pattern = re.compile(r'(?:(₹|\$|€|£)|(?:\b(INR|USD|EUR|GBP)\b))?\s*([\d]+(?:[.,]\d{1,2})?)', re.I)
-    tax_pattern = re.compile(r'Tax\s*\(?\s*(\d{1,2}(?:\.\d{1,2})?)?\s*%?\s*(?:GST)?\)?\s*[:\-]?\s*(?:(₹|\$|€|£)|(?:\b(INR|USD|EUR|GBP)\b))?\s*([\d]+(?:[.,]\d{1,2})?)', re.I)
-
-    item_pattern_table = re.compile(r'^(.*?)\s+(\d+)\s+([\d]+(?:[.,]\d{1,2})?)\s+([\d]+(?:[.,]\d{1,2})?)$')
-    item_pattern_block_item = re.compile(r'item[:\-]\s*(.+)', re.I)
-    item_pattern_block_price = re.compile(r'price[:\-]\s*(?:(₹|\$|€|£)|(?:\b(INR|USD|EUR|GBP)\b))?\s*([\d]+(?:[.,]\d{1,2})?)', re.I)
-    item_pattern_block_qty = re.compile(r'quantity[:\-]\s*(.+)', re.I)
-    item_pattern_compact = re.compile(r'^(.*?)\s*[x×]\s*(\d+)\s*(?:[^\d]*?)(?:(₹|\$|€|£)|(?:\b(INR|USD|EUR|GBP)\b))?\s*([\d]+(?:[.,]\d{1,2})?)$', re.I)
-    item_pattern_direct_total = re.compile(r'^(.*?)\s*[x×]\s*(\d+)\s*(?:(₹|\$|€|£)|(?:\b(INR|USD|EUR|GBP)\b))?\s*([\d]+(?:[.,]\d{1,2})?)$', re.I)
-
-    skip_keywords = ["address", "receipt", "invoice", "bill", "tax id", "store name",
-                     "merchant", "cashier", "order", "payment", "mode", "date"]
-
-    for i, line in enumerate(lines[:10]):
-        if line.lower().startswith("store name"):
-            data['merchant'] = line.split(":", 1)[-1].strip()
-            break
-        if not data['merchant'] and not any(k in line.lower() for k in skip_keywords):
-            data['merchant'] = line
-
-    for line in lines:
-        if "date" in line.lower():
-            data['date'] = line.split(":")[-1].strip()
-            break
-        for dp in date_patterns:
-            m = dp.search(line)
-            if m:
-                data['date'] = m.group(1)
-                break
-
-    for line in lines:
-        l = line.lower()
-        m_tax = tax_pattern.search(line)
-        if m_tax:
-            try:
-                percent = m_tax.group(1)
-                symbol = m_tax.group(2)
-                code = m_tax.group(3)
-                amount = m_tax.group(4)
-                data['tax_percent'] = float(percent) if percent else 0.0
-                data['tax'] = float(amount.replace(',', '')) if amount else 0.0
-                data['currency'] = normalize_currency(symbol, code)
-            except:
-                pass
-
-        m = amount_pattern.search(line)
-        if not m:
-            continue
-        symbol, code, number = m.groups()
-        currency = normalize_currency(symbol, code)
-        if currency:
-            data['currency'] = currency
-        try:
-            val = float(number.replace(',', ''))
-        except:
-            continue
-        if "subtotal" in l:
-            data['subtotal'] = val
-        elif "total" in l:
-            data['total'] = val
-
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        l = line.lower()
-        if any(k in l for k in skip_keywords) or "total" in l or "subtotal" in l or "tax" in l:
-            i += 1
-            continue
-
-        m = item_pattern_table.match(line)
-        if m:
-            desc, qty_str, unit_str, total_str = m.groups()
-            try:
-                qty = int(qty_str)
-                unit_price = float(unit_str.replace(',', ''))
-                total_price = float(total_str.replace(',', ''))
-                currency = data['currency']
-                category = categorize_item(desc)
-                data['items'].append({
-                    'description': f"{desc} (x{qty} @ {currency}{unit_price:.2f})",
-                    'amount': total_price,
-                    'currency': currency,
-                    'category': category
-                })
-            except:
-                pass
-            i += 1
-            continue
-
-        m = item_pattern_block_item.search(line)
-        if m:
-            desc = m.group(1).strip()
-            price, qty_str = None, None
-            j = i + 1
-            while j < len(lines) and j <= i + 3:
-                pm = item_pattern_block_price.search(lines[j])
-                if pm:
-                    symbol = pm.group(1)
-                    code = pm.group(2)
-                    currency = normalize_currency(symbol, code) or data['currency']
-                    try:
-                        price = float(pm.group(3).replace(',', ''))
-                    except:
-                        pass
-                qm = item_pattern_block_qty.search(lines[j])
-                if qm:
-                    qty_str = qm.group(1).strip()
-                j += 1
-            if price is not None:
-                qty = 1
-                if qty_str:
-                    m_qty = re.search(r'(\d+)', qty_str)
-                    if m_qty:
-                        qty = int(m_qty.group(1))
-                total_price = qty * price
-                category = categorize_item(desc)
-                data['items'].append({
-                    'description': f"{desc} (x{qty} @ {currency}{price:.2f})",
-                    'amount': total_price,
-                    'currency': currency,
-                    'category': category
-                })
-            i = j
-            continue
-
-        m = item_pattern_compact.match(line)
-        if m:
-            desc, qty_str, symbol, code, price_str = m.groups()
-            try:
-                qty = int(qty_str)
-                total_price = float(price_str.replace(',', ''))
-                currency = normalize_currency(symbol, code) or data['currency']
-                unit_price = total_price / qty if qty > 0 else total_price
-                category = categorize_item(desc)
-                data['items'].append({
-                    'description': f"{desc} (x{qty} @ {currency}{unit_price:.2f})",
-                    'amount': total_price,
-                    'currency': currency,
-                    'category': category
-                })
-            except:
-                pass
-            i += 1
-            continue
-
-        m = item_pattern_direct_total.match(line)
-        if m:
-            desc, qty_str, symbol, code, total_str = m.groups()
-            try:
-                qty = int(qty_str)
-                total_price = float(total_str.replace(',', '')) if total_str else 0.0
-                currency = normalize_currency(symbol, code) or data['currency']
-                unit_price = total_price / qty if qty > 0 else total_price
-                category = categorize_item(desc)
-                data['items'].append({
-                    'description': f"{desc} (x{qty} @ {currency}{unit_price:.2f})",
-                    'amount': total_price,
-                    'currency': currency,
-                    'category': category
-                })
-            except:
-                pass
-            i += 1
-            continue
-
-        m = amount_pattern.search(line)
-        if m and not any(k in l for k in skip_keywords + ["total", "subtotal", "tax"]):
-            symbol, code, number = m.groups()
-            currency = normalize_currency(symbol, code) or data['currency']
-            try:
-                price = float(number.replace(',', ''))
-            except:
-                price = 0.0
-            desc = re.sub(r'[\d₹$€£.,]+', '', line).strip(" -:→")
-            if len(desc.split()) > 0 and not desc.lower().startswith("date"):
-                category = categorize_item(desc)
-                data['items'].append({
-                    'description': desc,
-                    'amount': price,
-                    'currency': currency,
-                    'category': category
-                })
-        i += 1
-
-    return data
-
 def format_receipt(data):
     lines = []
     lines.append("Processed Receipt Report")
@@ -484,103 +477,14 @@ def format_receipt(data):
 
     return "\n".join(lines)
 
-def categorize_item(desc):
-    desc_lower = desc.lower()
-    categories = {
-        'food & drinks': [
-            'restaurant', 'grocery', 'meal', 'dinner', 'lunch', 'breakfast', 'cafe',
-            'coffee', 'cappuccino', 'latte', 'espresso', 'muffin', 'pastry', 'croissant',
-            'snack', 'burger', 'pizza', 'sandwich', 'cake', 'bakery', 'donut', 'cookie',
-            'juice', 'beverage', 'drink', 'milk', 'apples', 'fruits', 'vegetables',
-            'meat', 'chicken', 'fish', 'beef', 'pork', 'rice', 'pasta', 'noodles',
-            'biryani', 'thali', 'paratha', 'samosa', 'pakora', 'tea'
-        ],
-        'travel & transport': [
-            'taxi', 'cab', 'uber', 'ola', 'hotel', 'motel', 'resort', 'hostel', 'airbnb',
-            'flight', 'airlines', 'indigo', 'emirates', 'spicejet', 'train', 'railway',
-            'bus', 'metro', 'tram', 'ferry', 'toll', 'parking', 'fuel', 'diesel', 'petrol',
-            'gasoline', 'car rental', 'bike rental', 'driver'
-        ],
-        'office & supplies': [
-            'paper', 'pen', 'printer', 'stationery', 'office', 'supplies', 'notebook',
-            'stapler', 'folder', 'file', 'highlighter', 'marker', 'ink', 'toner',
-            'eraser', 'board', 'whiteboard', 'chair', 'desk', 'furniture'
-        ],
-        'utilities & bills': [
-            'electricity', 'power', 'water', 'gas', 'internet', 'wifi', 'broadband',
-            'phone', 'mobile', 'cell', 'bill', 'recharge', 'cable', 'dth', 'telecom',
-            'airtel', 'jio', 'vodafone', 'bsnl'
-        ],
-        'electronics & gadgets': [
-            'headphones', 'earphones', 'airpods', 'speakers', 'laptop', 'computer', 'pc',
-            'desktop', 'monitor', 'keyboard', 'mouse', 'charger', 'adapter', 'mobile',
-            'tablet', 'smartphone', 'tv', 'television', 'camera', 'dslr', 'microwave',
-            'fridge', 'washing machine', 'ac', 'fan'
-        ],
-        'healthcare & pharmacy': [
-            'doctor', 'hospital', 'clinic', 'pharmacy', 'chemist', 'medicine', 'tablet',
-            'capsule', 'syrup', 'injection', 'surgery', 'xray', 'mri', 'scan',
-            'health', 'wellness', 'dental', 'dentist', 'optical', 'eyewear', 'spectacles',
-            'contact lens', 'mask', 'sanitizer', 'thermometer'
-        ],
-        'entertainment & media': [
-            'movie', 'cinema', 'theater', 'netflix', 'prime video', 'spotify', 'youtube',
-            'music', 'concert', 'game', 'gaming', 'playstation', 'xbox', 'nintendo',
-            'book', 'novel', 'magazine', 'newspaper', 'event', 'show', 'ticket'
-        ],
-        'shopping & fashion': [
-            'clothes', 'dress', 'shirt', 'tshirt', 'jeans', 'pants', 'trousers', 'jacket',
-            'sweater', 'hoodie', 'kurta', 'saree', 'lehenga', 'salwar', 'shoes', 'sandals',
-            'sneakers', 'boots', 'flipflops', 'bag', 'purse', 'handbag', 'wallet',
-            'watch', 'belt', 'cap', 'hat', 'sunglasses', 'jewelry', 'ring', 'necklace',
-            'bracelet', 'earrings', 'cosmetics', 'makeup', 'lipstick', 'perfume', 'beauty'
-        ],
-        'home & groceries': [
-            'detergent', 'soap', 'shampoo', 'toothpaste', 'toothbrush', 'cleaner',
-            'dishwash', 'floor cleaner', 'phenyl', 'mop', 'broom', 'utensil',
-            'spices', 'oil', 'salt', 'sugar', 'flour', 'atta', 'dal', 'beans', 'cereal'
-        ],
-        'education & learning': [
-            'school', 'college', 'university', 'fees', 'exam', 'coaching', 'tuition',
-            'course', 'online course', 'udemy', 'coursera', 'byjus', 'textbook',
-            'notebook', 'stationery', 'library', 'training', 'class','mouse'
-        ],
-        'personal care': [
-            'salon', 'spa', 'parlor', 'barber', 'haircut', 'massage', 'facial',
-            'cream', 'lotion', 'skincare', 'nail', 'manicure', 'pedicure'
-        ],
-        'sports & fitness': [
-            'gym', 'fitness', 'workout', 'yoga', 'zumba', 'trainer', 'cricket', 'bat',
-            'ball', 'football', 'basketball', 'tennis', 'racket', 'shuttle', 'jersey',
-            'cycle', 'bicycle', 'helmet', 'sports shoes', 'treadmill', 'dumbbell'
-        ],
-        'financial services': [
-            'bank', 'atm', 'loan', 'emi', 'insurance', 'mutual fund', 'policy',
-            'lic', 'sip', 'investment', 'credit card', 'debit card', 'upi',
-            'paytm', 'gpay', 'phonepe', 'stripe', 'paypal'
-        ],
-        'housing & rent': [
-            'rent', 'lease', 'apartment', 'flat', 'villa', 'pg', 'guesthouse',
-            'maintenance', 'society', 'property', 'brokerage'
-        ],
-        'others': [
-            'gift', 'donation', 'charity', 'subscription', 'membership', 'miscellaneous','gym'
-        ]
-    }
-
-    for cat, keywords in categories.items():
-        if any(k in desc_lower for k in keywords):
-            return cat
-    return 'uncategorized'
-
 @receipt_bp.route('/recent', methods=['GET'])
+@require_auth
+@response_cache.cached
 def get_recent_receipts():
     try:
         if expenses_collection is None:
             return jsonify({"error": "Database not initialized"}), 500
-        email = request.args.get("email")
-        if not email:
-            return jsonify({"error": "Email is required"}), 400
+        email = g.user["email"]
 
         receipts = list(expenses_collection.find({"email": email}).sort("created_at", -1).limit(5))
         for receipt in receipts:
@@ -592,60 +496,101 @@ def get_recent_receipts():
         traceback.print_exc()
         return jsonify({"error": f"Failed to fetch recent receipts: {str(e)}"}), 500
 
-@receipt_bp.route('/report/summary', methods=['GET'])
-def expense_summary():
+@receipt_bp.route('/list', methods=['GET'])
+@require_auth
+def list_receipts():
+    """
+    Page through a user's receipts, newest first. Takes the receipt_filters()
+    args plus limit, view=summary|full and the next_cursor of the previous page.
+    """
     try:
         if expenses_collection is None:
             return jsonify({"error": "Database not initialized"}), 500
-        email = request.args.get("email")
-        if not email:
-            return jsonify({"error": "Email is required"}), 400
-
-        pipeline_category = [
-            {"$match": {"email": email}},
-            {"$unwind": {"path": "$items", "preserveNullAndEmptyArrays": True}},
-            {"$group": {"_id": {"$ifNull": ["$items.category", "uncategorized"]}, "total": {"$sum": {"$ifNull": ["$items.amount", 0]}}}},
-            {"$sort": {"total": -1}}
-        ]
-        category_summary = list(expenses_collection.aggregate(pipeline_category))
-
-        pipeline_merchant = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": {"$ifNull": ["$merchant", "unknown"]}, "total": {"$sum": {"$ifNull": ["$total", 0]}}}},
-            {"$sort": {"total": -1}}
-        ]
-        merchant_summary = list(expenses_collection.aggregate(pipeline_merchant))
-
-        pipeline_payment = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": {"$ifNull": ["$payment_mode", "unknown"]}, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}
-        ]
-        payment_summary = list(expenses_collection.aggregate(pipeline_payment))
-
-        pipeline_month = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": {"$ifNull": ["$created_at", datetime.utcnow()]}}}, "total": {"$sum": {"$ifNull": ["$total", 0]}}}},
-            {"$sort": {"_id": 1}}
-        ]
-        monthly_summary = list(expenses_collection.aggregate(pipeline_month))
-
-        # Get the most common currency from receipts
-        pipeline_currency = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": "$currency", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 1}
-        ]
-        currency_result = list(expenses_collection.aggregate(pipeline_currency))
-        currency = currency_result[0]["_id"] if currency_result else "₹"
+        email = g.user["email"]
 
+        view = request.args.get('view', 'summary').lower()
+        if view not in ('summary', 'full'):
+            return jsonify({"error": "view must be 'summary' or 'full'"}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', RECEIPT_PAGE_SIZE)), 1), RECEIPT_PAGE_MAX)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        try:
+            query = receipt_filters(email, request.args)
+            if request.args.get('cursor'):
+                query = after_cursor(query, request.args['cursor'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        projection = SUMMARY_FIELDS if view == 'summary' else None
+        # One extra receipt tells whether there is another page
+        receipts = list(expenses_collection.find(query, projection).sort(RECEIPT_SORT).limit(limit + 1))
+        has_more = len(receipts) > limit
+        receipts = receipts[:limit]
+        next_cursor = encode_cursor(receipts[-1]) if has_more else None
+        for receipt in receipts:
+            receipt['_id'] = str(receipt['_id'])
+            receipt['created_at'] = receipt['created_at'].isoformat() if receipt.get('created_at') else None
         return jsonify({
-            "by_category": category_summary,
-            "by_merchant": merchant_summary,
-            "by_payment_mode": payment_summary,
-            "monthly_trend": monthly_summary,
-            "currency": currency
+            "receipts": receipts,
+            "next_cursor": next_cursor,
+            "has_more": has_more
         }), 200
+    except Exception as e:
+        print(f"Error in list_receipts: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": f"Failed to list receipts: {str(e)}"}), 500
+
+@receipt_bp.route('/export', methods=['GET'])
+@require_auth
+def export_receipts():
+    """
+    Stream a user's receipts as CSV or NDJSON, one row per line item, oldest
+    first. Takes the receipt_filters() args, format=csv|ndjson and batch_size.
+    Memory stays flat: rows are written from the cursor one batch at a time.
+    """
+    if expenses_collection is None:
+        return jsonify({"error": "Database not initialized"}), 500
+    email = g.user["email"]
+
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        batch_size = min(max(int(request.args.get('batch_size', EXPORT_BATCH_SIZE)), 1), EXPORT_BATCH_MAX)
+    except ValueError:
+        return jsonify({"error": "batch_size must be an integer"}), 400
+    try:
+        query = receipt_filters(email, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    receipts = expenses_collection.find(query, EXPORT_FIELDS).sort(EXPORT_SORT).batch_size(batch_size)
+
+    def generate():
+        try:
+            yield from EXPORT_WRITERS[export_format](receipts, batch_size)
+        except Exception as e:
+            # Headers are already sent; the truncated body is all we can signal
+            print(f"Error in export_receipts for {email}: {str(e)}")
+            traceback.print_exc()
+        finally:
+            receipts.close()
+
+    filename = f"receipts-{datetime.utcnow().strftime('%Y%m%d')}.{export_format}"
+    return Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@receipt_bp.route('/report/summary', methods=['GET'])
+@require_auth
+@response_cache.cached
+def expense_summary():
+    try:
+        if expenses_collection is None:
+            return jsonify({"error": "Database not initialized"}), 500
+        email = g.user["email"]
+
+        return jsonify(summary_widget(ReportContext(email))), 200
     except Exception as e:
         print(f"Error in expense_summary: {str(e)}")
         traceback.print_exc()
@@ -655,158 +600,54 @@ from datetime import datetime
 import traceback
 
 @receipt_bp.route('/report/budget', methods=['GET'])
+@require_auth
+@response_cache.cached
 def budget_vs_actual():
     try:
         if expenses_collection is None:
             print("Database not initialized")
             return jsonify({"error": "Database not initialized"}), 500
-        email = request.args.get("email")
-        if not email:
-            print("Email is required")
-            return jsonify({"error": "Email is required"}), 400
+        email = g.user["email"]
 
         # Check if user exists
-        user = expenses_collection.database["users"].find_one({"email": email})
-        print(f"User found for {email}: {user is not None}")
-        if not user:
+        ctx = ReportContext(email)
+        print(f"User found for {email}: {ctx.user is not None}")
+        if not ctx.user:
             print("User not found")
             return jsonify({"error": "User not found"}), 404
 
-        # Get user's default currency
-        default_currency = user.get("default_currency", "USD")
-        print(f"User default currency: {default_currency}")
-
-        # Get the most common currency from receipts
-        pipeline_currency = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": "$currency", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 1}
-        ]
-        currency_result = list(expenses_collection.aggregate(pipeline_currency))
-        receipt_currency = normalize_currency(currency_result[0]["_id"], None) if currency_result else "INR"
-        print(f"Receipt currency: {receipt_currency}")
-
-        year = datetime.utcnow().year
-        start_of_year = datetime(year, 1, 1)
-        actual_total = expenses_collection.aggregate([
-            {"$match": {"email": email, "created_at": {"$gte": start_of_year}}},
-            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}
-        ])
-        actual_total = next(actual_total, {"total": 0})["total"]
-        print(f"Actual total: {actual_total}")
-
-        # Convert actual_total to user's default currency if necessary
-        if receipt_currency != default_currency:
-            try:
-                rate = get_exchange_rate(receipt_currency, default_currency)
-                print(f"Exchange rate {receipt_currency} to {default_currency}: {rate}")
-                actual_total = actual_total * rate
-            except Exception as e:
-                print(f"Error converting actual total: {str(e)}")
-                return jsonify({"error": f"Currency conversion failed: {str(e)}"}), 500
-
-        monthly_budget = float(user.get("monthly_budget", 0.0))
-        yearly_budget = float(user.get("yearly_budget", 0.0))
-        print(f"Monthly budget: {monthly_budget}, Yearly budget: {yearly_budget}")
-
-        data = {
-            "actual": round(float(actual_total), 2),
-            "monthly_budget": round(float(monthly_budget), 2),
-            "yearly_budget": round(float(yearly_budget), 2),
-            "status": "over" if actual_total > yearly_budget else "within",
-            "currency": default_currency
-        }
-        return jsonify(data), 200
+        return jsonify(budget_widget(ctx)), 200
     except Exception as e:
         print(f"Error in budget_vs_actual: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": f"Failed to fetch budget data: {str(e)}"}), 500
 
 @receipt_bp.route('/report/tax', methods=['GET'])
+@require_auth
+@response_cache.cached
 def tax_report():
     try:
         if expenses_collection is None:
             print("Database not initialized")
             return jsonify({"error": "Database not initialized"}), 500
-        email = request.args.get("email")
-        if not email:
-            print("Email is required")
-            return jsonify({"error": "Email is required"}), 400
+        email = g.user["email"]
 
         # Check if user exists
-        user = expenses_collection.database["users"].find_one({"email": email})
-        print(f"User found for {email}: {user is not None}")
-        if not user:
+        ctx = ReportContext(email)
+        print(f"User found for {email}: {ctx.user is not None}")
+        if not ctx.user:
             print("User not found")
             return jsonify({"error": "User not found"}), 404
 
-        # Get user's default currency
-        default_currency = user.get("default_currency", "USD")
-        print(f"User default currency: {default_currency}")
-
-        # Get the most common currency from receipts
-        pipeline_currency = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": "$currency", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 1}
-        ]
-        currency_result = list(expenses_collection.aggregate(pipeline_currency))
-        receipt_currency = normalize_currency(currency_result[0]["_id"], None) if currency_result else "INR"
-        print(f"Receipt currency: {receipt_currency}")
-
-        pipeline = [
-            {"$match": {"email": email}},
-            {"$group": {
-                "_id": None,
-                "total_tax": {"$sum": {"$ifNull": ["$tax", 0]}},
-                "avg_tax_rate": {"$avg": {"$ifNull": ["$tax_percent", 0]}},
-                "receipts_with_tax": {"$sum": {"$cond": [{"$gt": ["$tax", 0]}, 1, 0]}}
-            }}
-        ]
-        result = list(expenses_collection.aggregate(pipeline))
-
-        data = result[0] if result else {
-            "total_tax": 0,
-            "avg_tax_rate": 0,
-            "receipts_with_tax": 0
-        }
-        print(f"Raw tax data: {data}")
-
-        # Convert total_tax to user's default currency if necessary
-        total_tax = float(data["total_tax"])
-        if receipt_currency != default_currency:
-            try:
-                rate = get_exchange_rate(receipt_currency, default_currency)
-                print(f"Exchange rate {receipt_currency} to {default_currency}: {rate}")
-                total_tax = total_tax * rate
-            except Exception as e:
-                print(f"Error converting total tax: {str(e)}")
-                return jsonify({"error": f"Currency conversion failed: {str(e)}"}), 500
-
-        data = {
-            "total_tax": round(total_tax, 2),
-            "avg_tax_rate": round(float(data["avg_tax_rate"]), 2),
-            "receipts_with_tax": data["receipts_with_tax"],
-            "currency": default_currency
-        }
-        return jsonify(data), 200
+        return jsonify(tax_widget(ctx)), 200
     except Exception as e:
         print(f"Error in tax_report: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": f"Failed to fetch tax data: {str(e)}"}), 500
 
-def normalize_currency(symbol, code):
-    mapping = {"₹": "INR", "$": "USD", "€": "EUR", "£": "GBP"}
-    reverse_mapping = {"INR": "₹", "USD": "$", "EUR": "€", "GBP": "£"}
-    if symbol and symbol in mapping:
-        return mapping[symbol]  # Return currency code for API
-    if code:
-        return code.upper()
-    return "INR"  # Default to INR code
-    
 @receipt_bp.route('/report/forecast', methods=['GET'])
+@require_auth
+@response_cache.cached
 def forecast_expenses():
     try:
         if expenses_collection is None:
@@ -819,10 +660,12 @@ def forecast_expenses():
                 "currency": "₹"
             }), 500
 
-        email = request.args.get("email")
-        if not email:
+        email = g.user["email"]
+
+        model = request.args.get('model', 'sma').lower()
+        if model not in FORECAST_MODELS:
             return jsonify({
-                "error": "Email is required",
+                "error": f"Unknown forecast model '{model}', expected one of: {', '.join(FORECAST_MODELS)}",
                 "months": [],
                 "totals": [],
                 "forecast_next_month": 0,
@@ -831,8 +674,8 @@ def forecast_expenses():
             }), 400
 
         # Check if user exists
-        user = expenses_collection.database["users"].find_one({"email": email})
-        if not user:
+        ctx = ReportContext(email)
+        if not ctx.user:
             return jsonify({
                 "error": "User not found",
                 "months": [],
@@ -857,89 +700,7 @@ def forecast_expenses():
                 "currency": "₹"
             }), 500
 
-        # Get monthly totals
-        pipeline_total = [
-            {"$match": {"email": email}},
-            {"$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m", "date": {"$ifNull": ["$created_at", datetime.utcnow()]}}},
-                "total": {"$sum": {"$ifNull": ["$total", 0]}}
-            }},
-            {"$sort": {"_id": 1}}
-        ]
-        monthly_data = list(expenses_collection.aggregate(pipeline_total))
-        months = [d["_id"] for d in monthly_data]
-        totals = [float(d["total"]) for d in monthly_data]
-
-        # Simple moving average for forecasting
-        forecast_next_month = 0
-        if len(totals) >= 3:
-            forecast_next_month = float(np.mean(totals[-3:]))
-        elif len(totals) >= 1:
-            forecast_next_month = float(totals[-1])
-
-        # Category-wise forecasting
-        pipeline_cat = [
-            {"$match": {"email": email}},
-            {"$unwind": {"path": "$items", "preserveNullAndEmptyArrays": True}},
-            {"$group": {
-                "_id": {
-                    "month": {"$dateToString": {"format": "%Y-%m", "date": {"$ifNull": ["$created_at", datetime.utcnow()]}}},
-                    "category": {"$ifNull": ["$items.category", "uncategorized"]}
-                },
-                "total": {"$sum": {"$ifNull": ["$items.amount", 0]}}
-            }},
-            {"$sort": {"_id.month": 1, "_id.category": 1}}
-        ]
-        cat_data = list(expenses_collection.aggregate(pipeline_cat))
-
-        categories = {}
-        for d in cat_data:
-            cat = d["_id"]["category"]
-            month = d["_id"]["month"]
-            if cat not in categories:
-                categories[cat] = {}
-            categories[cat][month] = float(d["total"])
-
-        all_months = sorted(set(months)) if months else []
-        category_forecasts = []
-        for cat, month_totals in categories.items():
-            cat_totals = [month_totals.get(m, 0) for m in all_months] if all_months else []
-            if not any(t > 0 for t in cat_totals):
-                continue
-
-            cat_forecast = 0
-            if len(cat_totals) >= 3:
-                cat_forecast = float(np.mean(cat_totals[-3:]))
-            elif len(cat_totals) >= 1:
-                cat_forecast = float(cat_totals[-1])
-
-            hist_avg = float(np.mean([t for t in cat_totals if t > 0])) if any(t > 0 for t in cat_totals) else 0
-            likely_overspend = cat_forecast > hist_avg * 1.2 if hist_avg > 0 else False
-
-            category_forecasts.append({
-                "category": cat,
-                "forecast": round(cat_forecast, 2),
-                "likely_overspend": likely_overspend
-            })
-
-        # Get the most common currency from receipts
-        pipeline_currency = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": "$currency", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 1}
-        ]
-        currency_result = list(expenses_collection.aggregate(pipeline_currency))
-        currency = currency_result[0]["_id"] if currency_result else "₹"
-
-        data = {
-            "months": months,
-            "totals": [round(float(t), 2) for t in totals],
-            "forecast_next_month": round(float(forecast_next_month), 2),
-            "category_forecasts": sorted(category_forecasts, key=lambda x: x["forecast"], reverse=True),
-            "currency": currency
-        }
-        return jsonify(data), 200
+        return jsonify(forecast_widget(ctx, model)), 200
     except Exception as e:
         print(f"Error in forecast_expenses: {str(e)}")
         traceback.print_exc()
@@ -953,199 +714,73 @@ def forecast_expenses():
         }), 500
 
 @receipt_bp.route('/overview-data', methods=['GET'])
+@require_auth
+@response_cache.cached
 def get_overview_data():
     try:
         if expenses_collection is None:
             return jsonify({"error": "Database not initialized"}), 500
-        
-        email = request.args.get("email")
-        if not email:
-            return jsonify({"error": "Email is required"}), 400
-
-        # Get currency
-        pipeline_currency = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": "$currency", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 1}
-        ]
-        currency_result = list(expenses_collection.aggregate(pipeline_currency))
-        currency = currency_result[0]["_id"] if currency_result else "₹"
-
-        # Total Spend (year-to-date)
-        year = datetime.utcnow().year
-        start_of_year = datetime(year, 1, 1)
-        pipeline_total = [
-            {"$match": {"email": email, "created_at": {"$gte": start_of_year}}},
-            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}
-        ]
-        total_result = list(expenses_collection.aggregate(pipeline_total))
-        total_spend = total_result[0]["total"] if total_result else 0
-
-        # This Month's Spend
-        now = datetime.utcnow()
-        start_of_month = datetime(now.year, now.month, 1)
-        end_of_month = datetime(now.year, now.month + 1, 1) if now.month < 12 else datetime(now.year + 1, 1, 1)
-        
-        pipeline_month = [
-            {"$match": {"email": email, "created_at": {"$gte": start_of_month, "$lt": end_of_month}}},
-            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}
-        ]
-        month_result = list(expenses_collection.aggregate(pipeline_month))
-        this_month_spend = month_result[0]["total"] if month_result else 0
-
-        # Total Receipts Count
-        receipts_count = expenses_collection.count_documents({"email": email})
-
-        # Categories Count
-        pipeline_categories = [
-            {"$match": {"email": email}},
-            {"$unwind": {"path": "$items", "preserveNullAndEmptyArrays": True}},
-            {"$group": {"_id": {"$ifNull": ["$items.category", "uncategorized"]}}},
-            {"$count": "categoriesCount"}
-        ]
-        categories_result = list(expenses_collection.aggregate(pipeline_categories))
-        categories_count = categories_result[0]["categoriesCount"] if categories_result else 0
 
-        return jsonify({
-            "totalSpend": total_spend,
-            "thisMonthSpend": this_month_spend,
-            "receiptsCount": receipts_count,
-            "categoriesCount": categories_count,
-            "currency": currency,
-            "status": "success"
-        }), 200
+        email = g.user["email"]
+
+        period = request.args.get('period', 'ytd').lower()
+        if period not in OVERVIEW_PERIODS:
+            return jsonify({"error": f"Unknown period '{period}', expected one of: {', '.join(OVERVIEW_PERIODS)}"}), 400
+
+        return jsonify(overview_widget(ReportContext(email), period)), 200
 
     except Exception as e:
         print(f"Error in get_overview_data: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": f"Failed to fetch overview data: {str(e)}"}), 500
-    
-    
-    
-@receipt_bp.route("/overview-data", methods=["GET"])
-def overview_data():
+
+@receipt_bp.route('/category-ratios', methods=['GET'])
+@require_auth
+@response_cache.cached
+def get_category_ratios():
     try:
         if expenses_collection is None:
             return jsonify({"error": "Database not initialized"}), 500
+        
+        email = g.user["email"]
 
-        email = request.args.get("email")
-        if not email:
-            return jsonify({"error": "Email is required"}), 400
-
-        # Total spend
-        total_spend = expenses_collection.aggregate([
-            {"$match": {"email": email}},
-            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}
-        ])
-        total_spend = next(total_spend, {}).get("total", 0)
-
-        # This month spend
-        now = datetime.utcnow()
-        month_start = datetime(now.year, now.month, 1)
-        this_month = expenses_collection.aggregate([
-            {"$match": {"email": email, "created_at": {"$gte": month_start}}},
-            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}
-        ])
-        this_month_spend = next(this_month, {}).get("total", 0)
-
-        # Receipts count
-        receipts_count = expenses_collection.count_documents({"email": email})
-
-        # Distinct categories count
-        categories_count = len(expenses_collection.distinct("items.category", {"email": email}))
-
-        # Most common currency
-        currency_result = list(expenses_collection.aggregate([
-            {"$match": {"email": email}},
-            {"$group": {"_id": "$currency", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 1}
-        ]))
-        currency = currency_result[0]["_id"] if currency_result else "₹"
-
-        return jsonify({
-            "totalSpend": total_spend,
-            "thisMonthSpend": this_month_spend,
-            "receiptsCount": receipts_count,
-            "categoriesCount": categories_count,
-            "currency": currency
-        }), 200
+        return jsonify(category_ratios_widget(ReportContext(email))), 200
 
     except Exception as e:
-        print(f"Error in overview_data: {str(e)}")
+        print(f"Error in get_category_ratios: {str(e)}")
         traceback.print_exc()
-        return jsonify({"error": f"Failed to fetch overview data: {str(e)}"}), 500
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        return jsonify({"error": f"Failed to fetch category ratios: {str(e)}"}), 500
 
-@receipt_bp.route('/category-ratios', methods=['GET'])
-def get_category_ratios():
+@receipt_bp.route('/dashboard', methods=['GET'])
+@require_auth
+@response_cache.cached
+def get_dashboard():
+    """
+    Every dashboard widget in one response, built from a single rollup read
+    and user lookup. ?fields=overview,budget,... picks widgets (default all),
+    ?model= the forecast model and ?period= the overview period.
+    """
     try:
         if expenses_collection is None:
             return jsonify({"error": "Database not initialized"}), 500
-        
-        email = request.args.get("email")
-        if not email:
-            return jsonify({"error": "Email is required"}), 400
-
-        # Get total spending
-        pipeline_total = [
-            {"$match": {"email": email}},
-            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$total", 0]}}}}
-        ]
-        total_result = list(expenses_collection.aggregate(pipeline_total))
-        total_spend = total_result[0]["total"] if total_result else 1  # Avoid division by zero
-
-        # Get spending by category
-        pipeline_category = [
-            {"$match": {"email": email}},
-            {"$unwind": {"path": "$items", "preserveNullAndEmptyArrays": True}},
-            {"$group": {
-                "_id": {"$ifNull": ["$items.category", "uncategorized"]},
-                "amount": {"$sum": {"$ifNull": ["$items.amount", 0]}}
-            }},
-            {"$sort": {"amount": -1}}
-        ]
-        category_data = list(expenses_collection.aggregate(pipeline_category))
-
-        # Calculate percentages
-        category_ratios = []
-        for category in category_data:
-            percentage = (category["amount"] / total_spend) * 100 if total_spend > 0 else 0
-            category_ratios.append({
-                "category": category["_id"],
-                "amount": category["amount"],
-                "percentage": round(percentage, 2)
-            })
 
-        return jsonify({
-            "category_ratios": category_ratios,
-            "total_spend": total_spend,
-            "status": "success"
-        }), 200
+        fields = list(dict.fromkeys(field.strip() for field in request.args.get('fields', '').split(',') if field.strip()))
+        fields = fields or list(DASHBOARD_WIDGETS)
+        unknown = [field for field in fields if field not in DASHBOARD_WIDGETS]
+        if unknown:
+            return jsonify({"error": f"Unknown dashboard fields: {', '.join(unknown)}; expected any of: {', '.join(DASHBOARD_WIDGETS)}"}), 400
+
+        model = request.args.get('model', 'sma').lower()
+        if model not in FORECAST_MODELS:
+            return jsonify({"error": f"Unknown forecast model '{model}', expected one of: {', '.join(FORECAST_MODELS)}"}), 400
+
+        period = request.args.get('period', 'ytd').lower()
+        if period not in OVERVIEW_PERIODS:
+            return jsonify({"error": f"Unknown period '{period}', expected one of: {', '.join(OVERVIEW_PERIODS)}"}), 400
+
+        return jsonify(dashboard_report(ReportContext(g.user["email"]), fields, model, period)), 200
 
     except Exception as e:
-        print(f"Error in get_category_ratios: {str(e)}")
+        print(f"Error in get_dashboard: {str(e)}")
         traceback.print_exc()
-        return jsonify({"error": f"Failed to fetch category ratios: {str(e)}"}), 500
+        return jsonify({"error": f"Failed to fetch dashboard: {str(e)}"}), 500
@@ -1,31 +1,48 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, url_for, make_response
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from datetime import datetime, timedelta
 from db import users_collection
-from bson import ObjectId
 from os import getenv
 import logging
-import requests
+from exchange_rates import exchange_rates
+from conversions import reconvert_receipts
+from auth import require_auth, invalidate_user
+from response_cache import response_cache
+from avatars import parse_data_url, store_avatar, load_avatar, delete_avatar, AVATAR_CONTENT_TYPES
+from bson import ObjectId
+from bson.errors import InvalidId
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 user_bp = Blueprint('users', __name__)
 
+DEFAULT_AVATAR = 'https://i.pravatar.cc/150?img=12'
+
+def avatar_url(user):
+    """Public URL of a user's avatar; stored images are served by get_avatar."""
+    if user.get('avatar_etag'):
+        return url_for('users.get_avatar', user_id=str(user['_id']), v=user['avatar_etag'], _external=True)
+    return user.get('avatar', DEFAULT_AVATAR)
+
+def migrate_inline_avatar(user):
+    """Move an avatar stored inline as a data URL into the avatars collection."""
+    try:
+        etag = store_avatar(user['_id'], *parse_data_url(user['avatar']))
+    except ValueError as e:
+        logger.error("Could not migrate avatar for %s: %s", user.get('email'), str(e))
+        return
+    users_collection.update_one({'_id': user['_id']}, {'$set': {'avatar': None, 'avatar_etag': etag}})
+    user['avatar'], user['avatar_etag'] = None, etag
+
 def get_exchange_rate(from_currency, to_currency):
     """
-    Fetch exchange rate between two currencies.
-    Uses open.er-api.com for live rates.
+    Exchange rate between two currencies, from the shared rate cache
+    (live rates from open.er-api.com, refreshed hourly).
     """
     try:
-        api_url = f'https://open.er-api.com/v6/latest/{from_currency}'
-        resp = requests.get(api_url)
-        resp.raise_for_status()
-        data = resp.json()
-        if 'rates' not in data or to_currency not in data['rates']:
-            raise ValueError('Invalid currency in rates')
-        rate = data['rates'][to_currency]
+        rate = exchange_rates.get_rate(from_currency, to_currency)
         logger.debug('Exchange rate %s->%s: %s', from_currency, to_currency, rate)
         return float(rate)
     except Exception as e:
@@ -59,7 +76,7 @@ def signup():
         if not username or not email or not password:
             logger.error("Missing required fields: username=%s, email=%s", username, email)
             return jsonify({'message': 'Missing required fields'}), 400
-        if users_collection.find_one({'email': email}):
+        if users_collection.find_one({'email': email}, {'_id': 1}):
             logger.warning("Email already exists: %s", email)
             return jsonify({'message': 'Email already exists'}), 400
         hashed_pw = generate_password_hash(password)
@@ -71,7 +88,7 @@ def signup():
             'profile_completed': False,
             'name': username,
             'phone': '',
-            'avatar': 'https://i.pravatar.cc/150?img=12',
+            'avatar': DEFAULT_AVATAR,
             'dob': '',
             'gender': '',
             'address': '',
@@ -120,7 +137,7 @@ def login():
         if not email or not password:
             logger.error("Missing required fields: email=%s", email)
             return jsonify({'message': 'Missing required fields'}), 400
-        user = users_collection.find_one({'email': email})
+        user = users_collection.find_one({'email': email}, {'password': 1})
         if not user or not check_password_hash(user['password'], password):
             logger.warning("Invalid credentials for email: %s", email)
             return jsonify({'message': 'Invalid credentials'}), 401
@@ -143,30 +160,16 @@ def login():
         return jsonify({'message': f'Error during login: {str(e)}'}), 500
 
 @user_bp.route('/me', methods=['GET'])
+@require_auth
 def get_user():
     try:
-        token = request.headers.get('Authorization')
-        if not token or not token.startswith('Bearer '):
-            logger.warning("Token missing or invalid")
-            return jsonify({'message': 'Token missing or invalid'}), 401
-        token = token.split(' ')[1]
-        jwt_secret = getenv('JWT_SECRET_KEY')
-        if not jwt_secret:
-            logger.error("JWT_SECRET_KEY not set")
-            return jsonify({'message': 'Server configuration error: JWT_SECRET_KEY missing'}), 500
-        try:
-            payload = jwt.decode(token, jwt_secret, algorithms=['HS256'])
-        except jwt.ExpiredSignatureError:
-            logger.warning("Token expired")
-            return jsonify({'message': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            logger.warning("Invalid token")
-            return jsonify({'message': 'Invalid token'}), 401
-        user_id = ObjectId(payload['user_id'])
-        user = users_collection.find_one({'_id': user_id})
+        user_id = g.user_id
+        user = users_collection.find_one({'_id': user_id}, {'password': 0})
         if not user:
             logger.warning("User not found: %s", user_id)
             return jsonify({'message': 'User not found'}), 404
+        if str(user.get('avatar') or '').startswith('data:image/'):
+            migrate_inline_avatar(user)
         logger.info("User fetched: %s", user['email'])
         return jsonify({
             '_id': str(user['_id']),
@@ -175,7 +178,7 @@ def get_user():
             'email': user.get('email', ''),
             'phone': user.get('phone', ''),
             'joined': user['created_at'].strftime('%Y-%m-%d'),
-            'avatar': user.get('avatar', 'https://i.pravatar.cc/150?img=12'),
+            'avatar': avatar_url(user),
             'dob': user.get('dob', ''),
             'gender': user.get('gender', ''),
             'address': user.get('address', ''),
@@ -210,28 +213,33 @@ def get_user():
         logger.error("Error fetching user: %s", str(e))
         return jsonify({'message': f'Error fetching user: {str(e)}'}), 500
 
+@user_bp.route('/<user_id>/avatar', methods=['GET'])
+def get_avatar(user_id):
+    try:
+        user_id = ObjectId(user_id)
+    except InvalidId:
+        return jsonify({'message': 'Avatar not found'}), 404
+    avatar = load_avatar(user_id, with_data=False)
+    # Avatars stored before the type allowlist may hold other image types
+    if not avatar or avatar['content_type'] not in AVATAR_CONTENT_TYPES:
+        return jsonify({'message': 'Avatar not found'}), 404
+    if avatar['etag'] not in request.if_none_match:
+        avatar = load_avatar(user_id)
+    response = make_response(bytes(avatar['data']) if 'data' in avatar else b'')
+    response.headers['Content-Type'] = avatar['content_type']
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = "default-src 'none'"
+    response.set_etag(avatar['etag'])
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request)
+
 @user_bp.route('/me', methods=['PUT'])
+@require_auth
 def update_user():
     try:
-        token = request.headers.get('Authorization')
-        if not token or not token.startswith('Bearer '):
-            logger.warning("Token missing or invalid")
-            return jsonify({'message': 'Token missing or invalid'}), 401
-        token = token.split(' ')[1]
-        jwt_secret = getenv('JWT_SECRET_KEY')
-        if not jwt_secret:
-            logger.error("JWT_SECRET_KEY not set")
-            return jsonify({'message': 'Server configuration error: JWT_SECRET_KEY missing'}), 500
-        try:
-            payload = jwt.decode(token, jwt_secret, algorithms=['HS256'])
-        except jwt.ExpiredSignatureError:
-            logger.warning("Token expired")
-            return jsonify({'message': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            logger.warning("Invalid token")
-            return jsonify({'message': 'Invalid token'}), 401
-        user_id = ObjectId(payload['user_id'])
-        user = users_collection.find_one({'_id': user_id})
+        user_id = g.user_id
+        user = users_collection.find_one({'_id': user_id}, {'password': 0, 'avatar': 0})
         if not user:
             logger.warning("User not found: %s", user_id)
             return jsonify({'message': 'User not found'}), 404
@@ -240,6 +248,7 @@ def update_user():
             logger.error("No input data provided for update")
             return jsonify({'message': 'No input data provided'}), 400
         update_data = {}
+        new_avatar = None
 
         # Track currency change for conversion
         old_currency = user.get('default_currency', 'USD')
@@ -262,13 +271,24 @@ def update_user():
                         logger.error("Invalid value for %s: %s", field, data[field])
                         return jsonify({'message': f'Invalid value for {field}'}), 400
                 elif field == 'email' and data[field] != user['email']:
-                    if users_collection.find_one({'email': data[field]}):
+                    if users_collection.find_one({'email': data[field]}, {'_id': 1}):
                         logger.warning("Email already exists: %s", data[field])
                         return jsonify({'message': 'Email already exists'}), 400
                     update_data[field] = data[field]
                 elif field == 'avatar':
-                    if data[field] is None or data[field] == 'https://i.pravatar.cc/150?img=12' or str(data[field]).startswith('data:image/'):
+                    if data[field] is None or data[field] == DEFAULT_AVATAR:
                         update_data[field] = data[field]
+                        update_data['avatar_etag'] = None
+                    elif str(data[field]).startswith('data:image/'):
+                        # Uploaded images live in the avatars collection, not the user document
+                        try:
+                            new_avatar = parse_data_url(data[field])
+                        except ValueError as e:
+                            logger.error("Invalid avatar upload: %s", str(e))
+                            return jsonify({'message': str(e)}), 400
+                    elif str(data[field]).split('?')[0] == url_for('users.get_avatar', user_id=str(user_id), _external=True):
+                        # The client sent back the avatar URL it was given; nothing changed
+                        pass
                     else:
                         logger.error("Invalid avatar format: %s", str(data[field])[:50] if data[field] else 'None')
                         return jsonify({'message': 'Invalid avatar image format'}), 400
@@ -331,8 +351,24 @@ def update_user():
         )
         update_data['profile_completed'] = profile_completed
 
+        if new_avatar:
+            update_data['avatar'] = None
+            update_data['avatar_etag'] = store_avatar(user_id, *new_avatar)
+
         if update_data:
             users_collection.update_one({'_id': user_id}, {'$set': update_data})
+            invalidate_user(user_id)
+        if 'avatar_etag' in update_data and update_data['avatar_etag'] is None:
+            delete_avatar(user_id)
+
+        # Stored receipt amounts follow the new default currency
+        if 'default_currency' in data and new_currency != old_currency:
+            try:
+                reconvert_receipts(user['email'], new_currency)
+            except Exception as e:
+                logger.error("Could not convert receipts to %s for %s: %s", new_currency, user['email'], str(e))
+        # Reports depend on the user's currency and budgets
+        response_cache.bump(user['email'])
         logger.info("Profile updated for user: %s", user['email'])
         return jsonify({'message': 'Profile updated successfully'}), 200
 
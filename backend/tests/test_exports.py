@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exports import csv_chunks, ndjson_chunks
+
+def ocr_receipt(merchant, description):
+    return {
+        '_id': ObjectId(),
+        'created_at': datetime(2024, 3, 1, 12, 0),
+        'merchant': merchant,
+        'currency': 'USD',
+        'total': -4.5,
+        'items': [{'description': description, 'category': 'shopping', 'amount': -4.5, 'currency': 'USD'}]
+    }
+
+def read_csv(receipts):
+    return list(csv.DictReader(io.StringIO("".join(csv_chunks(receipts)))))
+
+def test_csv_escapes_formula_cells_from_ocr():
+    receipt = ocr_receipt('=HYPERLINK("http://evil.example","Click")', '+SUM(A1:A9)')
+    rows = read_csv([receipt])
+    assert rows[0]['merchant'] == '\'=HYPERLINK("http://evil.example","Click")'
+    assert rows[0]['item_description'] == "'+SUM(A1:A9)"
+
+def test_csv_escapes_every_formula_prefix():
+    for prefix in ('=', '+', '-', '@', '\t', '\r'):
+        rows = read_csv([ocr_receipt(prefix + 'cmd', 'item')])
+        assert rows[0]['merchant'] == "'" + prefix + 'cmd'
+
+def test_csv_leaves_plain_text_and_numbers_alone():
+    rows = read_csv([ocr_receipt('Corner Shop', 'Coffee')])
+    assert rows[0]['merchant'] == 'Corner Shop'
+    assert rows[0]['item_description'] == 'Coffee'
+    assert rows[0]['total'] == '-4.5'
+    assert rows[0]['item_amount'] == '-4.5'
+
+def test_ndjson_keeps_original_text():
+    receipt = ocr_receipt('=HYPERLINK("x")', 'item')
+    row = json.loads("".join(ndjson_chunks([receipt])).splitlines()[0])
+    assert row['merchant'] == '=HYPERLINK("x")'
@@ -27,7 +27,12 @@ const OverviewCards = ({ email }) => {
       setIsLoading(true);
 
       const overviewResponse = await fetch(
-        `${getApiBaseUrl()}/api/receipt/overview-data?email=${encodeURIComponent(email)}`
+        `${getApiBaseUrl()}/api/receipt/overview-data?email=${encodeURIComponent(email)}&period=all`,
+        {
+          headers: {
+            Authorization: `Bearer ${localStorage.getItem("token")}`,
+          },
+        }
       );
 
       if (!overviewResponse.ok) {
@@ -39,10 +44,11 @@ const OverviewCards = ({ email }) => {
         throw new Error(overviewData.error);
       }
 
+      // Receipt and category counts are all-time; Total Spend stays year-to-date
       setCardsData([
         {
           title: "Total Spend",
-          value: formatCurrency(overviewData.totalSpend, overviewData.currency),
+          value: formatCurrency(overviewData.ytdSpend, overviewData.currency),
           id: "total-spend",
         },
         {
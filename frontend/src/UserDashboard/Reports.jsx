@@ -47,7 +47,17 @@ const Reports = () => {
       return;
     }
 
-    const fetchData = async (url, setData, defaultData, endpoint) => {
+    const widgets = {
+      summary: [setSummary, { by_category: [], by_merchant: [], monthly_trend: [], currency: "" }],
+      budget: [setBudget, { actual: 0, monthly_budget: 0, yearly_budget: 0, status: "within", currency: "" }],
+      tax: [setTax, { total_tax: 0, avg_tax_rate: 0, receipts_with_tax: 0, currency: "" }],
+      forecast: [setForecast, { months: [], totals: [], forecast_next_month: 0, category_forecasts: [], currency: "" }]
+    };
+
+    // All four reports come from one /dashboard request
+    const fetchAllData = async () => {
+      setLoading(true);
+      const url = `${API_URL}/api/receipt/dashboard?fields=${Object.keys(widgets).join(",")}`;
       try {
         const res = await fetch(url, {
           headers: { Authorization: `Bearer ${token}` }
@@ -59,43 +69,23 @@ const Reports = () => {
         if (data.error) {
           throw new Error(data.error);
         }
-        setErrors(prev => ({ ...prev, [endpoint]: null }));
-        setData(data);
+        const widgetErrors = data.errors || {};
+        Object.entries(widgets).forEach(([endpoint, [setData, defaultData]]) => {
+          if (widgetErrors[endpoint] || !data[endpoint]) {
+            setErrors(prev => ({ ...prev, [endpoint]: `Failed to fetch ${endpoint}: ${widgetErrors[endpoint] || "missing from response"}` }));
+            setData(defaultData);
+          } else {
+            setErrors(prev => ({ ...prev, [endpoint]: null }));
+            setData(data[endpoint]);
+          }
+        });
       } catch (err) {
         console.error(`Error fetching ${url}: ${err.message}`);
-        setErrors(prev => ({ ...prev, [endpoint]: `Failed to fetch ${endpoint}: ${err.message}` }));
-        setData(defaultData);
+        Object.entries(widgets).forEach(([endpoint, [setData, defaultData]]) => {
+          setErrors(prev => ({ ...prev, [endpoint]: `Failed to fetch ${endpoint}: ${err.message}` }));
+          setData(defaultData);
+        });
       }
-    };
-
-    const fetchAllData = async () => {
-      setLoading(true);
-      await Promise.all([
-        fetchData(
-          `${API_URL}/api/receipt/report/summary?email=${email}`,
-          setSummary,
-          { by_category: [], by_merchant: [], monthly_trend: [], currency: "" },
-          "summary"
-        ),
-        fetchData(
-          `${API_URL}/api/receipt/report/budget?email=${email}`,
-          setBudget,
-          { actual: 0, monthly_budget: 0, yearly_budget: 0, status: "within", currency: "" },
-          "budget"
-        ),
-        fetchData(
-          `${API_URL}/api/receipt/report/tax?email=${email}`,
-          setTax,
-          { total_tax: 0, avg_tax_rate: 0, receipts_with_tax: 0, currency: "" },
-          "tax"
-        ),
-        fetchData(
-          `${API_URL}/api/receipt/report/forecast?email=${email}`,
-          setForecast,
-          { months: [], totals: [], forecast_next_month: 0, category_forecasts: [], currency: "" },
-          "forecast"
-        )
-      ]);
       setLoading(false);
     };
 
@@ -3,12 +3,13 @@ import jsPDF from 'jspdf';
 import "./UploadReceipt.css";
 
 const UploadReceipt = () => {
-    const [file, setFile] = useState(null);
+    const [files, setFiles] = useState([]);
     const [fileName, setFileName] = useState("");
     const [isDragging, setIsDragging] = useState(false);
     const [isUploading, setIsUploading] = useState(false);
     const [isUploaded, setIsUploaded] = useState(false);
     const [processedData, setProcessedData] = useState(null);
+    const [batchResult, setBatchResult] = useState(null);
     const [error, setError] = useState(null);
     const [recentReceipts, setRecentReceipts] = useState([]);
     const fileInputRef = useRef(null);
@@ -59,31 +60,55 @@ const UploadReceipt = () => {
         setIsDragging(false);
     };
 
+    const isValidFile = (f) =>
+        f.type === "image/jpeg" || f.type === "image/png" || f.type === "application/pdf" ||
+        f.type === "application/zip" || f.name.toLowerCase().endsWith(".zip");
+
+    const selectFiles = (fileList) => {
+        const selected = Array.from(fileList || []).filter(isValidFile);
+        if (selected.length > 0) {
+            setFiles(selected);
+            setFileName(selected.length === 1 ? selected[0].name : `${selected.length} files selected`);
+            setError(null);
+        } else {
+            setError("Please upload a valid image (JPEG, PNG), PDF or ZIP file");
+        }
+    };
+
     const handleDrop = (e) => {
         e.preventDefault();
         setIsDragging(false);
-        const droppedFile = e.dataTransfer.files[0];
-        if (droppedFile && (droppedFile.type === "image/jpeg" || droppedFile.type === "image/png" || droppedFile.type === "application/pdf")) {
-            setFile(droppedFile);
-            setFileName(droppedFile.name);
-        } else {
-            setError("Please upload a valid image (JPEG, PNG) or PDF file");
-        }
+        selectFiles(e.dataTransfer.files);
     };
 
     const handleFileChange = (e) => {
-        const selectedFile = e.target.files[0];
-        if (selectedFile && (selectedFile.type === "image/jpeg" || selectedFile.type === "image/png" || selectedFile.type === "application/pdf")) {
-            setFile(selectedFile);
-            setFileName(selectedFile.name);
-            setError(null);
-        } else {
-            setError("Please upload a valid image (JPEG, PNG) or PDF file");
+        selectFiles(e.target.files);
+    };
+
+    // Batch uploads run as a background job; poll it until the report is ready
+    const waitForJob = async (statusUrl, token) => {
+        for (;;) {
+            await new Promise((resolve) => setTimeout(resolve, 2000));
+            const response = await fetch(`${API_URL}${statusUrl}`, {
+                headers: {
+                    Authorization: `Bearer ${token}`,
+                },
+            });
+            const job = await response.json();
+            if (!response.ok) {
+                throw new Error(job.error || "Failed to check batch upload status");
+            }
+            if (job.status === "done") {
+                return job.result;
+            }
+            if (job.status === "failed") {
+                throw new Error(job.error || "Batch upload failed");
+            }
         }
     };
 
     const handleUpload = async () => {
-        if (!file) {
+        if (files.length === 0) {
             setError("Please select a file first");
             return;
         }
@@ -102,11 +127,13 @@ const UploadReceipt = () => {
                 throw new Error("User email not found in localStorage. Please login again.");
             }
 
+            // Several files or a zip archive go through the batch endpoint as one job
+            const isBatch = files.length > 1 || files[0].type === "application/zip" || files[0].name.toLowerCase().endsWith(".zip");
             const formData = new FormData();
-            formData.append("file", file);
+            files.forEach((f) => formData.append(isBatch ? "files" : "file", f));
             formData.append("email", email);
 
-            const response = await fetch(`${API_URL}/api/receipt/upload`, {
+            const response = await fetch(`${API_URL}/api/receipt/${isBatch ? "upload/batch" : "upload"}`, {
                 method: "POST",
                 headers: {
                     Authorization: `Bearer ${token}`,
@@ -120,7 +147,11 @@ const UploadReceipt = () => {
                 throw new Error(data.error || "Upload failed");
             }
 
-            setProcessedData(data);
+            if (isBatch) {
+                setBatchResult(await waitForJob(data.status_url, token));
+            } else {
+                setProcessedData(data);
+            }
             setIsUploaded(true);
             fetchRecentReceipts();  // Refresh recent receipts after upload
         } catch (err) {
@@ -208,10 +239,11 @@ const UploadReceipt = () => {
     };
 
     const handleReset = () => {
-        setFile(null);
+        setFiles([]);
         setFileName("");
         setIsUploaded(false);
         setProcessedData(null);
+        setBatchResult(null);
         setError(null);
         if (fileInputRef.current) {
             fileInputRef.current.value = "";
@@ -252,7 +284,7 @@ const UploadReceipt = () => {
                                 <h3>Upload Successful!</h3>
                                 <p>Receipt processed successfully</p>
                             </>
-                        ) : file ? (
+                        ) : files.length > 0 ? (
                             <>
                                 <h3>File Selected</h3>
                                 <p>{fileName}</p>
@@ -261,7 +293,7 @@ const UploadReceipt = () => {
                             <>
                                 <h3>Drag & Drop</h3>
                                 <p>your receipt file here or click to browse</p>
-                                <span>Supports JPG, PNG, PDF - Max 10MB</span>
+                                <span>Supports JPG, PNG, PDF or a ZIP of receipts - Max 10MB per file</span>
                             </>
                         )}
                     </div>
@@ -291,7 +323,8 @@ const UploadReceipt = () => {
                     type="file"
                     ref={fileInputRef}
                     onChange={handleFileChange}
-                    accept=".jpg,.jpeg,.png,.pdf"
+                    accept=".jpg,.jpeg,.png,.pdf,.zip"
+                    multiple
                     style={{ display: "none" }}
                 />
 
@@ -305,9 +338,9 @@ const UploadReceipt = () => {
                                 Browse Files
                             </button>
                             <button
-                                className={`upload-btn ${file ? "active" : ""}`}
+                                className={`upload-btn ${files.length > 0 ? "active" : ""}`}
                                 onClick={handleUpload}
-                                disabled={!file || isUploading}
+                                disabled={files.length === 0 || isUploading}
                             >
                                 Process Receipt
                             </button>
@@ -324,6 +357,19 @@ const UploadReceipt = () => {
 
                 {error && <p className="error-text">{error}</p>}
 
+                {batchResult && (
+                    <div className="report-section">
+                        <h3>Batch Upload Report</h3>
+                        <p><strong>Processed:</strong> {batchResult.inserted} receipts</p>
+                        {batchResult.duplicates.length > 0 && (
+                            <p><strong>Skipped duplicates:</strong> {batchResult.duplicates.map((d) => d.filename).join(", ")}</p>
+                        )}
+                        {batchResult.errors.length > 0 && (
+                            <p><strong>Failed:</strong> {batchResult.errors.map((e) => `${e.filename} (${e.error})`).join(", ")}</p>
+                        )}
+                    </div>
+                )}
+
                 {processedData && (
                     <div className="report-section">
                         <h3>Processed Receipt Report</h3>